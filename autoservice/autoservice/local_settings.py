@@ -0,0 +1,4 @@
+SECRET_KEY = 'dev'
+EMAIL_HOST = ''
+EMAIL_HOST_USER = ''
+EMAIL_HOST_PASSWORD = ''
@@ -0,0 +1,119 @@
+import json
+import logging
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('autoservice.requests')
+
+
+class QueryCounter:
+    """execute_wrapper callable collecting the number and time of SQL statements."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.calls = Counter()
+        self.timings = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            self.calls[sql] += 1
+            self.timings[sql] += elapsed
+
+    @property
+    def duplicates(self):
+        return sum(calls - 1 for calls in self.calls.values() if calls > 1)
+
+    def top(self, limit):
+        return sorted(self.timings.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Counts queries, SQL time and repeated statements per request, adds them
+    as a Server-Timing header and logs one line per request. Requests over
+    REQUEST_QUERY_BUDGET queries or REQUEST_LATENCY_BUDGET_MS also get their
+    slowest statements logged. A streaming response runs its body after the
+    view returned, so only the view is measured: it gets no header and its
+    line is logged with "streaming": true.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.query_budget = getattr(settings, 'REQUEST_QUERY_BUDGET', 50)
+        self.latency_budget = getattr(settings, 'REQUEST_LATENCY_BUDGET_MS', 500)
+        self.top_statements = getattr(settings, 'REQUEST_TOP_STATEMENTS', 5)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with self.wrap_connections(ExitStack(), counter):
+            response = self.get_response(request)
+        return self.record(request, response, counter, start)
+
+    async def __acall__(self, request):
+        # connections belong to a thread: the async ORM runs in the request's
+        # thread sensitive thread, so the wrappers are installed there
+        counter = QueryCounter()
+        start = time.perf_counter()
+        stack = await sync_to_async(self.wrap_connections)(ExitStack(), counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.record(request, response, counter, start)
+
+    def wrap_connections(self, stack, counter):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        return stack
+
+    def record(self, request, response, counter, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = counter.duration * 1000
+
+        if not response.streaming:
+            response['Server-Timing'] = (
+                f'db;dur={db_ms:.1f};desc="{counter.count} queries", app;dur={total_ms:.1f}'
+            )
+        over_budget = counter.count > self.query_budget or total_ms > self.latency_budget
+        if not over_budget and not logger.isEnabledFor(logging.INFO):
+            return response
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 1),
+            'db_ms': round(db_ms, 1),
+            'queries': counter.count,
+            'duplicates': counter.duplicates,
+        }
+        if response.streaming:
+            record['streaming'] = True
+        if over_budget:
+            record['top_sql'] = [
+                {'sql': sql[:500], 'calls': counter.calls[sql], 'ms': round(seconds * 1000, 1)}
+                for sql, seconds in counter.top(self.top_statements)
+            ]
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+        return response
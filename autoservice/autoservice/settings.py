@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from . import local_settings
 
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'autoservice.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,14 +77,29 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'autoservice.wsgi.application'
 
+# serve the async garage read views, set by autoservice.asgi
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # django.db.backends.sqlite3 plus pragmas and BEGIN IMMEDIATE, see autoservice/sqlite
+        'ENGINE': 'autoservice.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024,  # KiB
+            'busy_timeout': 5000,  # ms
+        },
+        'BEGIN_IMMEDIATE': True,
+        'BEGIN_RETRIES': 5,
     }
 }
 
@@ -165,4 +182,30 @@ TINYMCE_DEFAULT_CONFIG = {
     'contextmenu': 'formats | link image',
     'menubar': False,
     'statusbar': True,
-    }
\ No newline at end of file
+    }
+
+# Background workers building profile picture renditions, 0 builds them after the request commits
+
+PROFILE_RENDITION_WORKERS = 2
+
+# Per-request SQL and latency instrumentation (autoservice.middleware)
+
+REQUEST_QUERY_BUDGET = 50
+REQUEST_LATENCY_BUDGET_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'autoservice.requests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
\ No newline at end of file
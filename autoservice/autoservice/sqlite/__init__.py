@@ -0,0 +1,29 @@
+"""
+SQLite backend with per-connection pragmas and BEGIN IMMEDIATE write transactions.
+
+Configured in settings.DATABASES:
+
+    'ENGINE': 'autoservice.sqlite',
+    'PRAGMAS': {'journal_mode': 'WAL', ...},
+    'BEGIN_IMMEDIATE': True,  # used by immediate_atomic()
+    'BEGIN_RETRIES': 5,
+"""
+from contextlib import contextmanager
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """
+    transaction.atomic() that takes the write lock up front (BEGIN IMMEDIATE),
+    so a transaction never fails half way when it upgrades from read to write.
+    Other database backends get a plain atomic block.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    previous = getattr(connection, 'begin_immediate', False)
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using):
+            yield
+    finally:
+        connection.begin_immediate = previous
@@ -0,0 +1,27 @@
+import time
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    begin_immediate = False
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if not (self.begin_immediate and self.settings_dict.get('BEGIN_IMMEDIATE', True)):
+            return super()._start_transaction_under_autocommit()
+        # busy_timeout already waits for the lock, a few retries ride out long writers
+        retries = self.settings_dict.get('BEGIN_RETRIES', 5)
+        for attempt in range(retries + 1):
+            try:
+                self.cursor().execute('BEGIN IMMEDIATE')
+                return
+            except OperationalError as e:
+                if attempt == retries or 'locked' not in str(e):
+                    raise
+                time.sleep(0.05 * 2 ** attempt)
@@ -0,0 +1,82 @@
+import json
+import re
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from . middleware import QueryInstrumentationMiddleware
+
+User = get_user_model()
+
+SERVER_TIMING = re.compile(r'^db;dur=\d+\.\d;desc="(\d+) queries", app;dur=\d+\.\d$')
+
+
+def run_queries(*statements):
+    def get_response(request):
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+        return HttpResponse('ok')
+    return get_response
+
+
+class QueryInstrumentationTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/orders/')
+
+    def logged(self, middleware, level='INFO'):
+        with self.assertLogs('autoservice.requests', level) as logs:
+            response = middleware(self.request)
+        self.assertEqual(len(logs.records), 1)
+        return response, logs.records[0].levelname, json.loads(logs.records[0].getMessage())
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('index'))
+        match = SERVER_TIMING.match(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        self.assertGreater(int(match[1]), 0)
+
+        middleware = QueryInstrumentationMiddleware(run_queries('SELECT 1', 'SELECT 2'))
+        response, _, _ = self.logged(middleware)
+        self.assertEqual(SERVER_TIMING.match(response['Server-Timing'])[1], '2')
+
+    def test_duplicates(self):
+        middleware = QueryInstrumentationMiddleware(run_queries('SELECT 1', 'SELECT 1', 'SELECT 1', 'SELECT 2'))
+        _, level, record = self.logged(middleware)
+        self.assertEqual(level, 'INFO')
+        self.assertEqual((record['queries'], record['duplicates']), (4, 2))
+        self.assertEqual(record['path'], '/orders/')
+        self.assertNotIn('top_sql', record)
+
+    @override_settings(REQUEST_QUERY_BUDGET=2, REQUEST_TOP_STATEMENTS=1)
+    def test_over_budget_logs_top_sql(self):
+        middleware = QueryInstrumentationMiddleware(run_queries('SELECT 1', 'SELECT 1', 'SELECT 1'))
+        _, level, record = self.logged(middleware, 'WARNING')
+        self.assertEqual(level, 'WARNING')
+        self.assertEqual(len(record['top_sql']), 1)
+        self.assertEqual(record['top_sql'][0]['sql'], 'SELECT 1')
+        self.assertEqual(record['top_sql'][0]['calls'], 3)
+
+    def test_streaming_response_is_marked(self):
+        staff = User.objects.create_user('accountant', is_staff=True)
+        self.client.force_login(staff)
+        with self.assertLogs('autoservice.requests', 'INFO') as logs:
+            response = self.client.get(reverse('order_export'))
+            b''.join(response.streaming_content)
+        self.assertNotIn('Server-Timing', response)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'order_export')
+        self.assertIs(record['streaming'], True)
+
+    async def test_async_requests(self):
+        async def get_response(request):
+            return await sync_to_async(run_queries('SELECT 1', 'SELECT 1'))(request)
+
+        middleware = QueryInstrumentationMiddleware(get_response)
+        with self.assertLogs('autoservice.requests', 'INFO') as logs:
+            response = await middleware(self.request)
+        self.assertEqual(SERVER_TIMING.match(response['Server-Timing'])[1], '2')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['queries'], record['duplicates']), (2, 1))
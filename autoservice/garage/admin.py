@@ -1,12 +1,19 @@
 from django.contrib import admin
-from . import models
+from . import models, search
 
 # Register your models here.
 
 class CarAdmin(admin.ModelAdmin):
     list_display = ('plate_nr', 'client', 'vin', 'car_model')
     list_filter = ( 'car_model', 'client')
-    search_fields = ('plate_numer', 'vin')
+    search_fields = ('plate_nr', 'vin')
+
+    def get_search_results(self, request, queryset, search_term):
+        # a full or leading plate/VIN is found through the plate_key/vin_key indexes
+        cars = search.identifier_cars(search_term)
+        if cars is not None:
+            return queryset.filter(pk__in=cars), False
+        return super().get_search_results(request, queryset, search_term)
 
 class CarModelAdmin(admin.ModelAdmin):
     list_display = ('make', 'model', 'engine', 'year')
@@ -18,12 +25,15 @@ class OrderEntryInline(admin.TabularInline):
     extra = 0
 
 class OrderEntryAdmin(admin.ModelAdmin):
-    list_display = ('quantity', 'price', 'service', 'order')
+    list_display = ('quantity', 'unit_price', 'line_total', 'service', 'order')
 
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('date', 'amount', 'client', 'due_back')
+    list_display = ('date', 'total', 'entry_count', 'client', 'due_back')
     inlines = [OrderEntryInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('client')
+
 class ServiceAdmin(admin.ModelAdmin):
     list_display = ('name', 'price')
 
@@ -0,0 +1,120 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.paginator import Paginator
+from django.db.models import QuerySet
+from django.http import Http404
+from django.shortcuts import render
+from django.views import View
+from . import counters, search, views
+from . forms import OrderReviewForm
+from . models import Car, Order, OrderEntry, OrderReview
+from . pagination import CursorPaginator
+
+# Async versions of the read-heavy garage views, routed instead of garage.views
+# when the project is served by autoservice.asgi (settings.ASYNC_VIEWS). They
+# render the same templates with the same context.
+
+
+async def load_user(request):
+    # Django 4.2 has no async auth/session API: resolve the lazy user (and with
+    # it the session) in one thread hop, so templates never query from the event loop
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+async def paginate(request, qs, per_page, ordering):
+    """Cursor page for querysets, numbered page for ranked search results."""
+    if isinstance(qs, QuerySet):
+        return await CursorPaginator(qs, per_page, ordering).aget_page(request.GET.get('cursor'))
+
+    def numbered_page():
+        # evaluate everything the paginator templates read
+        page = Paginator(qs, per_page).get_page(request.GET.get('page'))
+        page.object_list = list(page.object_list)
+        page.paginator.count
+        return page
+    return await sync_to_async(numbered_page)()
+
+
+async def index(request):
+    await load_user(request)
+    return views.render_index(request, await counters.aget_counters())
+
+
+async def car_model_list(request):
+    await load_user(request)
+    qs = search.model_cars(Car.objects.select_related('car_model'), request.GET.get('query'))
+    car_model_list = await paginate(request, qs, 5, ('id',))
+    return render(request, 'garage/car_models.html', {'car_model_list': car_model_list})
+
+
+async def car_detail(request, pk: int):
+    await load_user(request)
+    try:
+        car = await Car.objects.select_related('client', 'car_model').aget(pk=pk)
+    except Car.DoesNotExist:
+        raise Http404
+    return render(request, 'garage/car_detail.html', {'car': car})
+
+
+class OrderListView(View):
+    paginate_by = 5
+    template_name = 'garage/order_list.html'
+
+    async def get_queryset(self):
+        return await search.amatching_orders(Order.objects.select_related('car'), self.request.GET.get('query'))
+
+    async def get(self, request, *args, **kwargs):
+        await load_user(request)
+        page = await paginate(request, await self.get_queryset(), self.paginate_by, Order._meta.ordering)
+        return render(request, self.template_name, {
+            'order_list': page.object_list,
+            'object_list': page.object_list,
+            'page_obj': page,
+            'paginator': page.paginator,
+            'is_paginated': page.has_other_pages(),
+        })
+
+
+class UserOrderListView(OrderListView):
+    paginate_by = 7
+    template_name = 'garage/user_orders_list.html'
+
+    async def get_queryset(self):
+        return Order.objects.filter(client=self.request.user)
+
+    async def get(self, request, *args, **kwargs):
+        user = await load_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await super().get(request, *args, **kwargs)
+
+
+class OderDetailView(View):
+    template_name = 'garage/order_detail.html'
+
+    async def get(self, request, pk: int):
+        user, order, entries, reviews = await asyncio.gather(
+            load_user(request),
+            Order.objects.select_related('car__client', 'car__car_model').filter(pk=pk).afirst(),
+            self.alist(OrderEntry.objects.filter(order_id=pk).select_related('service')),
+            self.alist(OrderReview.objects.filter(order_id=pk).select_related('reviewer__profile')),
+        )
+        if order is None:
+            raise Http404
+        return render(request, self.template_name, {
+            'order': order,
+            'object': order,
+            'entries': entries,
+            'reviews': reviews,
+            'form': OrderReviewForm(initial={'order': order, 'reviewer': user}),
+        })
+
+    async def post(self, request, pk: int):
+        # posting a review is a write, the synchronous view handles it
+        return await sync_to_async(views.OderDetailView.as_view())(request, pk=pk)
+
+    @staticmethod
+    async def alist(qs):
+        return [obj async for obj in qs]
@@ -0,0 +1,83 @@
+import threading
+import time
+from bisect import bisect_left
+from . models import CarModel
+
+# An in-memory prefix index over the CarModel catalog for the autocomplete
+# endpoint. It is built on first use in each worker process and dropped by
+# signals when a car model changes, the timeout makes other worker processes
+# reload it eventually as well.
+
+INDEX_TIMEOUT = 5 * 60
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 20
+
+_lock = threading.Lock()
+# (built at, sorted keys, car model position per key, car models)
+_index = None
+
+
+def normalize(value):
+    return ' '.join(value.casefold().split())
+
+
+def label(make, model, engine=None, year=None):
+    return ' '.join(str(part) for part in (make, model, engine, year) if part not in (None, ''))
+
+
+def build():
+    car_models = [
+        {
+            'id': car_model['pk'],
+            'label': label(car_model['make'], car_model['model'], car_model['engine'], car_model['year']),
+            'make': car_model['make'],
+            'model': car_model['model'],
+            'engine': car_model['engine'],
+            'year': car_model['year'],
+        }
+        for car_model in CarModel.objects.order_by('make', 'model', '-year', 'pk').values(
+            'pk', 'make', 'model', 'engine', 'year')
+    ]
+    # every word of the label starts a key, so "golf" finds "Volkswagen Golf" as well
+    entries = []
+    for position, car_model in enumerate(car_models):
+        words = normalize(car_model['label']).split()
+        entries.extend((' '.join(words[start:]), position) for start in range(len(words)))
+    entries.sort()
+    keys = [key for key, _ in entries]
+    positions = [position for _, position in entries]
+    return time.monotonic(), keys, positions, car_models
+
+
+def get_index():
+    global _index
+    index = _index
+    if index is None or time.monotonic() - index[0] > INDEX_TIMEOUT:
+        with _lock:
+            # another thread may have built it while this one waited
+            if _index is index:
+                _index = build()
+            index = _index
+    return index
+
+
+def invalidate():
+    global _index
+    _index = None
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    """Return up to limit car models with a label word starting with the query."""
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    _, keys, positions, car_models = get_index()
+    found = []
+    for i in range(bisect_left(keys, prefix), len(keys)):
+        if not keys[i].startswith(prefix):
+            break
+        if positions[i] not in found:
+            found.append(positions[i])
+            if len(found) >= limit:
+                break
+    return [car_models[position] for position in found]
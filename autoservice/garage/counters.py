@@ -0,0 +1,42 @@
+import asyncio
+from django.core.cache import cache
+from . models import Car, Order, Service
+
+# Landing page counters are cached and dropped by signals when they change.
+# The timeout makes other worker processes recount eventually as well.
+
+CACHE_KEY = 'garage:index_counters'
+CACHE_TIMEOUT = 5 * 60
+
+
+def get_counters():
+    counters = cache.get(CACHE_KEY)
+    if counters is None:
+        counters = {
+            'service_count': Service.objects.count(),
+            'count_orders': Order.objects.filter(status__exact=3).count(),
+            'count_cars': Car.objects.count(),
+        }
+        cache.set(CACHE_KEY, counters, CACHE_TIMEOUT)
+    return counters
+
+
+async def aget_counters():
+    counters = await cache.aget(CACHE_KEY)
+    if counters is None:
+        service_count, count_orders, count_cars = await asyncio.gather(
+            Service.objects.acount(),
+            Order.objects.filter(status__exact=3).acount(),
+            Car.objects.acount(),
+        )
+        counters = {
+            'service_count': service_count,
+            'count_orders': count_orders,
+            'count_cars': count_cars,
+        }
+        await cache.aset(CACHE_KEY, counters, CACHE_TIMEOUT)
+    return counters
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
@@ -0,0 +1,81 @@
+import hashlib
+import io
+import posixpath
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+# Resized copies of Car.cover, built on the first request for one of them and
+# kept on disk next to the covers. File names carry a hash of the cover name,
+# so a new cover never serves a stale copy; the old copies are purged by
+# signals. Car.cover_renditions records the real width of every copy, so pages
+# neither touch the storage nor advertise widths a small cover does not have.
+
+WIDTHS = (320, 640, 1024)
+RENDITION_DIR = 'garage/car_covers/renditions'
+
+
+def rendition_name(car, width):
+    digest = hashlib.sha1(car.cover.name.encode()).hexdigest()[:12]
+    return f'{RENDITION_DIR}/{car.pk}/{digest}-{width}.jpg'
+
+
+def built_widths(car):
+    """Real width of every rendition of the current cover, None until they are built."""
+    if not car.cover or car.cover_renditions.get('source') != car.cover.name:
+        return None
+    return {int(width): real_width for width, real_width in car.cover_renditions['widths'].items()}
+
+
+def build(car):
+    source = car.cover.name
+    with car.cover.open('rb') as cover:
+        image = ImageOps.exif_transpose(Image.open(cover)).convert('RGB')
+    widths = {}
+    # each copy is resized from the next larger one, thumbnail() never upscales
+    for width in sorted(WIDTHS, reverse=True):
+        image.thumbnail((width, width * 4))
+        widths[str(width)] = image.width
+        name = rendition_name(car, width)
+        if default_storage.exists(name):
+            continue
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=80, optimize=True, progressive=True)
+        saved_name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        if saved_name != name:
+            # built concurrently by another request
+            default_storage.delete(saved_name)
+    car.cover_renditions = {'source': source, 'widths': widths}
+    # the cover may have been replaced meanwhile
+    type(car).objects.filter(pk=car.pk, cover=source).update(cover_renditions=car.cover_renditions)
+
+
+def url(car, width):
+    if built_widths(car) is None:
+        return reverse('car_cover', kwargs={'pk': car.pk, 'width': width})
+    return default_storage.url(rendition_name(car, width))
+
+
+def srcset(car):
+    widths = built_widths(car)
+    if widths is None:
+        return ''
+    # a cover narrower than a width gets copies of the same size, only the smallest is listed
+    candidates = {}
+    for width in sorted(widths):
+        candidates.setdefault(widths[width], width)
+    return ', '.join(
+        f'{default_storage.url(rendition_name(car, width))} {real_width}w'
+        for real_width, width in candidates.items()
+    )
+
+
+def purge(car_pk):
+    directory = posixpath.join(RENDITION_DIR, str(car_pk))
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for file_name in files:
+        default_storage.delete(posixpath.join(directory, file_name))
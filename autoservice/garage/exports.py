@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from django.utils.dateparse import parse_date
+from . models import Order, OrderEntry
+
+# Order exports for accounting. Rows are produced lazily from
+# keyset chunks, so memory stays flat whatever the size of the export.
+# Totals come from the stored, SQL maintained Order.total column.
+
+CSV_COLUMNS = (
+    'order_id', 'date', 'due_back', 'status', 'client', 'client_name', 'plate_nr', 'vin',
+    'make', 'model', 'entry_count', 'total', 'service', 'quantity', 'unit_price', 'line_total',
+)
+STATUSES = {status: str(label) for status, label in Order.STATUS_CHOICES}
+
+
+def parse_filters(date_from=None, date_to=None, statuses=()):
+    filters = {}
+    for name, value, lookup in (('date_from', date_from, 'date__gte'), ('date_to', date_to, 'date__lte')):
+        if value:
+            parsed = parse_date(value)
+            if parsed is None:
+                raise ValueError(f'{name} must be a YYYY-MM-DD date')
+            filters[lookup] = parsed
+    if statuses:
+        try:
+            filters['status__in'] = [int(status) for status in statuses]
+        except ValueError:
+            raise ValueError('status must be one of %s' % ', '.join(map(str, STATUSES)))
+        if not set(filters['status__in']) <= set(STATUSES):
+            raise ValueError('status must be one of %s' % ', '.join(map(str, STATUSES)))
+    return filters
+
+
+ORDER_FIELDS = (
+    'pk', 'date', 'due_back', 'status', 'entry_count', 'total', 'car__plate_nr', 'car__vin',
+    'car__client__username', 'car__client__first_name', 'car__client__last_name',
+    'car__car_model__make', 'car__car_model__model',
+)
+
+
+def export_queryset(filters):
+    return Order.objects.filter(**filters).order_by('pk')
+
+
+def order_rows(queryset, chunk_size=2000):
+    # keyset chunks of plain values: one query for the orders and one for their
+    # entries per chunk, no model instances are built
+    last_pk = 0
+    while True:
+        orders = list(queryset.filter(pk__gt=last_pk).values(*ORDER_FIELDS)[:chunk_size])
+        if not orders:
+            return
+        last_pk = orders[-1]['pk']
+        entries = defaultdict(list)
+        for entry in OrderEntry.objects.filter(
+            order_id__in=[order['pk'] for order in orders]
+        ).order_by('pk').values('order_id', 'service__name', 'quantity', 'unit_price', 'line_total'):
+            entries[entry['order_id']].append({
+                'service': entry['service__name'],
+                'quantity': entry['quantity'],
+                'unit_price': str(entry['unit_price']),
+                'line_total': str(entry['line_total']),
+            })
+        for order in orders:
+            username = order['car__client__username']
+            yield {
+                'order_id': order['pk'],
+                'date': order['date'].isoformat(),
+                'due_back': order['due_back'].isoformat() if order['due_back'] else None,
+                'status': STATUSES.get(order['status'], order['status']),
+                'client': username,
+                'client_name': ' '.join(filter(None, (
+                    order['car__client__first_name'], order['car__client__last_name']))) if username else None,
+                'plate_nr': order['car__plate_nr'],
+                'vin': order['car__vin'],
+                'make': order['car__car_model__make'],
+                'model': order['car__car_model__model'],
+                'entry_count': order['entry_count'],
+                'total': str(order['total']),
+                'entries': entries[order['pk']],
+            }
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def csv_lines(rows):
+    # one line per entry, the order columns are repeated on each of them
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        for entry in row['entries'] or [{}]:
+            writer.writerow({**row, **entry})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
@@ -1,11 +1,41 @@
 from django import forms
-from . import models
+from django.forms.models import ModelChoiceIteratorValue
+from django.urls import reverse_lazy
+from . import autocomplete, models
 
 
 class DateInput(forms.DateInput):
     input_type = 'date'
 
 
+class CarModelSelect(forms.Select):
+    """
+    Car model select filled by the autocomplete endpoint. Only the selected car
+    model is rendered, so the page does not grow with the catalog; the field
+    still validates the posted id against its queryset.
+    """
+
+    class Media:
+        js = ('garage/js/autocomplete.js',)
+
+    def __init__(self, attrs=None, choices=()):
+        super().__init__({'data-autocomplete': reverse_lazy('car_model_autocomplete'), **(attrs or {})}, choices)
+
+    def optgroups(self, name, value, attrs=None):
+        catalog = self.choices
+        selected_ids = [pk for pk in value if str(pk).isdigit()]
+        self.choices = [('', catalog.field.empty_label)] if catalog.field.empty_label is not None else []
+        self.choices += [
+            (ModelChoiceIteratorValue(car_model.pk, car_model),
+             autocomplete.label(car_model.make, car_model.model, car_model.engine, car_model.year))
+            for car_model in catalog.queryset.filter(pk__in=selected_ids)
+        ]
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = catalog
+
+
 class OrderReviewForm(forms.ModelForm):
     class Meta:
         model = models.OrderReview
@@ -32,4 +62,5 @@ class CarCreateForm(forms.ModelForm):
         fields =('car_model', 'plate_nr', 'vin', 'client', 'cover')
         widgets = {
             'client': forms.HiddenInput(),
+            'car_model': CarModelSelect(),
         }
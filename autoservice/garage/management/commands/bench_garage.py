@@ -0,0 +1,116 @@
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from garage import views
+from garage.models import Order
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the garage hot paths against the current (seeded) database, '
+        'compare wall time and query counts with a JSON baseline'
+    )
+
+    def add_arguments(self, parser):
+        # wall times only compare on the machine that saved them, the default file is git-ignored
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'bench_baseline.json'),
+                            help='machine-specific baseline file, not committed')
+        parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='allowed relative wall time increase, 0.25 = 25%%')
+        parser.add_argument('--query', default='golf', help='search term for the search benchmarks')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        if not Order.objects.exists():
+            raise CommandError('The database has no orders, run seed_garage first')
+        self.factory = RequestFactory()
+        self.repeat = max(options['repeat'], 1)
+        results = {
+            name: self.measure(benchmark)
+            for name, benchmark in self.benchmarks(options['query']).items()
+        }
+        for name, result in results.items():
+            self.stdout.write('%-20s %9.2f ms %5d queries' % (name, result['ms'], result['queries']))
+
+        baseline_path = Path(options['baseline'])
+        if options['save']:
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True))
+            self.stdout.write(self.style.SUCCESS('Baseline saved to %s' % baseline_path))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING('No baseline at %s, run with --save' % baseline_path))
+            return
+        regressions = self.compare(json.loads(baseline_path.read_text()), results, options['tolerance'])
+        if regressions:
+            raise CommandError('Performance regressions:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against %s' % baseline_path))
+
+    def benchmarks(self, query):
+        client_id = Order.objects.order_by('-pk').values_list('car__client_id', flat=True).first()
+        client = User.objects.get(pk=client_id) if client_id else AnonymousUser()
+        order = Order.objects.order_by('-total', '-pk').first()
+
+        def order_amount():
+            return [item.amount for item in Order.objects.order_by('-pk')[:100]]
+
+        return {
+            'index': lambda: self.get(views.index, '/'),
+            'order_amount': order_amount,
+            'order_list': lambda: self.get(views.OrderListView.as_view(), '/orders/'),
+            'order_list_search': lambda: self.get(
+                views.OrderListView.as_view(), '/orders/', {'query': query}),
+            'user_orders': lambda: self.get(
+                views.UserOrderListView.as_view(), '/orders/my/', user=client),
+            'car_model_search': lambda: self.get(
+                views.car_model_list, '/car_models/', {'query': query}),
+            'order_detail': lambda: self.get(
+                views.OderDetailView.as_view(), f'/order/{order.pk}/', pk=order.pk),
+        }
+
+    def get(self, view, path, data=None, user=None, **kwargs):
+        request = self.factory.get(path, data)
+        request.user = user or AnonymousUser()
+        request.session = SessionStore()
+        response = view(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code != 200:
+            raise CommandError('%s answered %d' % (path, response.status_code))
+        return response
+
+    def measure(self, benchmark):
+        benchmark()
+        timings = []
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                benchmark()
+                timings.append((time.perf_counter() - start) * 1000)
+        return {'ms': round(statistics.median(timings), 3), 'queries': len(queries)}
+
+    def compare(self, baseline, results, tolerance):
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            expected = baseline[name]
+            if result['queries'] > expected['queries']:
+                regressions.append('%s: %d queries, baseline %d' % (
+                    name, result['queries'], expected['queries']))
+            if result['ms'] > expected['ms'] * (1 + tolerance):
+                regressions.append('%s: %.2f ms, baseline %.2f ms (+%d%%)' % (
+                    name, result['ms'], expected['ms'], (result['ms'] / expected['ms'] - 1) * 100))
+        return regressions
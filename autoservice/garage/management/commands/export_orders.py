@@ -0,0 +1,33 @@
+import sys
+from typing import Any
+from django.core.management.base import BaseCommand, CommandError
+from garage import exports
+
+
+class Command(BaseCommand):
+    help = 'Stream every order with its client, car, entries and total as CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+        parser.add_argument('--output', default='-', help='file path, - for stdout')
+        parser.add_argument('--date-from', help='YYYY-MM-DD')
+        parser.add_argument('--date-to', help='YYYY-MM-DD')
+        parser.add_argument('--status', action='append', default=[], help='can be given several times')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        try:
+            filters = exports.parse_filters(options['date_from'], options['date_to'], options['status'])
+        except ValueError as e:
+            raise CommandError(e)
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        rows = exports.order_rows(exports.export_queryset(filters), options['chunk_size'])
+        lines = exports.csv_lines(rows) if options['format'] == 'csv' else exports.jsonl_lines(rows)
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', newline='', encoding='utf-8')
+        try:
+            for line in lines:
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,291 @@
+import csv
+import json
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from garage import autocomplete, counters, rollups, search
+from garage.management.utils import manual_order_dates
+from garage.models import Car, CarModel, Order, OrderEntry, Service
+from user_profile.models import Profile
+
+User = get_user_model()
+
+# Columns per file kind. Rows are upserted on "id" (on "username" for clients),
+# foreign keys are given as the id of the referenced row (username for clients).
+COLUMNS = {
+    'clients': ('username', 'first_name', 'last_name', 'email'),
+    'car_models': ('id', 'make', 'model', 'engine', 'year'),
+    'services': ('id', 'name', 'price'),
+    'cars': ('id', 'plate_nr', 'vin', 'notes', 'client', 'car_model'),
+    'orders': ('id', 'date', 'due_back', 'status', 'car'),
+    'entries': ('id', 'order', 'service', 'quantity', 'unit_price'),
+}
+# the order the files are imported in, so that referenced rows exist first
+KINDS = ('clients', 'car_models', 'services', 'cars', 'orders', 'entries')
+MAX_REPORTED_REJECTS = 20
+
+
+class RowError(Exception):
+    pass
+
+
+def read_rows(path, format):
+    with open(path, newline='', encoding='utf-8') as file:
+        if format == 'csv':
+            for line_number, row in enumerate(csv.DictReader(file), start=2):
+                yield line_number, {key: value for key, value in row.items() if value != ''}
+        else:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_number, e
+                    continue
+                yield line_number, row if isinstance(row, dict) else ValueError('not an object')
+
+
+class Command(BaseCommand):
+    help = 'Stream clients, car models, services, cars, orders and entries from CSV or JSONL files'
+
+    def add_arguments(self, parser):
+        for kind in KINDS:
+            parser.add_argument(
+                f'--{kind.replace("_", "-")}', dest=kind, metavar='PATH',
+                help='columns: %s' % ', '.join(COLUMNS[kind]))
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help='default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--rejects', metavar='PATH', help='write rejected rows to this JSONL file')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        files = [(kind, options[kind]) for kind in KINDS if options[kind]]
+        if not files:
+            raise CommandError('Give at least one file, e.g. --cars cars.csv')
+        for kind, path in files:
+            if not Path(path).is_file():
+                raise CommandError('%s does not exist' % path)
+
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        self.reported_rejects = 0
+        self.rejects_file = open(options['rejects'], 'w', encoding='utf-8') if options['rejects'] else None
+        # small catalogs are kept in memory, large tables are looked up per batch
+        self.car_model_ids = set(CarModel.objects.values_list('pk', flat=True))
+        self.service_prices = dict(Service.objects.values_list('pk', 'price'))
+        self.unusable_password = make_password(None)
+        try:
+            with manual_order_dates():
+                for kind, path in files:
+                    format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+                    self.import_file(kind, path, format)
+        finally:
+            if self.rejects_file:
+                self.rejects_file.close()
+
+        if search.is_enabled() and {'clients', 'car_models', 'cars'} & {kind for kind, _ in files}:
+            with transaction.atomic():
+                search.rebuild()
+        counters.invalidate()
+        autocomplete.invalidate()
+
+    def import_file(self, kind, path, format):
+        imported_count = rejected_count = 0
+        batch = []
+        for line_number, row in read_rows(path, format):
+            batch.append((line_number, row))
+            if len(batch) >= self.batch_size:
+                imported, rejected = self.import_batch(kind, path, batch)
+                imported_count, rejected_count = imported_count + imported, rejected_count + rejected
+                batch = []
+                if self.verbosity > 1:
+                    self.stdout.write('%s: %d imported, %d rejected' % (kind, imported_count, rejected_count))
+        if batch:
+            imported, rejected = self.import_batch(kind, path, batch)
+            imported_count, rejected_count = imported_count + imported, rejected_count + rejected
+        style = self.style.WARNING if rejected_count else self.style.SUCCESS
+        self.stdout.write(style('%s: %d rows imported, %d rejected' % (kind, imported_count, rejected_count)))
+
+    def reject(self, kind, path, line_number, row, error):
+        if self.rejects_file:
+            self.rejects_file.write(json.dumps({
+                'kind': kind, 'file': path, 'line': line_number,
+                'row': row if isinstance(row, dict) else None, 'error': str(error),
+            }, default=str) + '\n')
+        elif self.reported_rejects < MAX_REPORTED_REJECTS:
+            self.stderr.write('%s:%d: %s' % (path, line_number, error))
+            self.reported_rejects += 1
+
+    def import_batch(self, kind, path, batch):
+        build = getattr(self, f'build_{kind}')
+        lookups = getattr(self, f'lookups_{kind}', lambda rows: None)(
+            [row for _, row in batch if isinstance(row, dict)])
+        objects, rejected = [], 0
+        for line_number, row in batch:
+            try:
+                if not isinstance(row, dict):
+                    raise RowError(row)
+                unknown = set(row) - set(COLUMNS[kind])
+                if unknown:
+                    raise RowError('unknown columns: %s' % ', '.join(sorted(unknown)))
+                obj = build(row, lookups)
+                obj.full_clean(
+                    exclude=[field.name for field in obj._meta.concrete_fields if field.is_relation],
+                    validate_unique=False,
+                )
+                objects.append(obj)
+            except (RowError, ValidationError, ValueError, TypeError, ArithmeticError) as e:
+                rejected += 1
+                self.reject(kind, path, line_number, row, e)
+        with transaction.atomic():
+            getattr(self, f'save_{kind}')(objects)
+        return len(objects), rejected
+
+    def upsert(self, model, objects, update_fields):
+        # rows with an id update the existing row (only the imported columns), the rest are inserted
+        if not objects:
+            return
+        with_id = [obj for obj in objects if obj.pk is not None]
+        without_id = [obj for obj in objects if obj.pk is None]
+        if with_id:
+            model.objects.bulk_create(
+                with_id, update_conflicts=True, unique_fields=['id'], update_fields=update_fields)
+        if without_id:
+            model.objects.bulk_create(without_id)
+
+    # clients
+
+    def build_clients(self, row, lookups):
+        if not row.get('username'):
+            raise RowError('username is required')
+        return User(
+            username=row['username'],
+            first_name=row.get('first_name', ''),
+            last_name=row.get('last_name', ''),
+            email=row.get('email', ''),
+            password=self.unusable_password,
+        )
+
+    def save_clients(self, users):
+        if not users:
+            return
+        User.objects.bulk_create(
+            users, update_conflicts=True, unique_fields=['username'],
+            update_fields=['first_name', 'last_name', 'email'],
+        )
+        user_ids = User.objects.filter(
+            username__in=[user.username for user in users]).values_list('pk', flat=True)
+        Profile.objects.bulk_create([Profile(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+
+    # car models and services
+
+    def build_car_models(self, row, lookups):
+        return CarModel(
+            id=row.get('id'), make=row.get('make'), model=row.get('model'),
+            engine=row.get('engine'), year=row.get('year'),
+        )
+
+    def save_car_models(self, car_models):
+        self.upsert(CarModel, car_models, ['make', 'model', 'engine', 'year'])
+        rollups.mark_orders(Order.objects.filter(
+            car__car_model_id__in=[car_model.pk for car_model in car_models if car_model.pk]))
+        self.car_model_ids.update(car_model.pk for car_model in car_models if car_model.pk)
+
+    def build_services(self, row, lookups):
+        return Service(id=row.get('id'), name=row.get('name'), price=row.get('price'))
+
+    def save_services(self, services):
+        self.upsert(Service, services, ['name', 'price'])
+        self.service_prices.update(
+            (service.pk, Decimal(str(service.price))) for service in services if service.pk)
+
+    # cars
+
+    def lookups_cars(self, rows):
+        usernames = {row['client'] for row in rows if row.get('client')}
+        return dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+
+    def build_cars(self, row, client_ids):
+        client_id = None
+        if row.get('client'):
+            client_id = client_ids.get(row['client'])
+            if client_id is None:
+                raise RowError('unknown client %s' % row['client'])
+        car_model_id = row.get('car_model')
+        if car_model_id is not None:
+            car_model_id = int(car_model_id)
+            if car_model_id not in self.car_model_ids:
+                raise RowError('unknown car model %s' % car_model_id)
+        car = Car(
+            id=row.get('id'), plate_nr=row.get('plate_nr'), vin=row.get('vin'),
+            notes=row.get('notes'), client_id=client_id, car_model_id=car_model_id,
+        )
+        car.render_notes()
+        car.set_identifier_keys()
+        return car
+
+    def save_cars(self, cars):
+        self.upsert(Car, cars, [
+            'plate_nr', 'plate_key', 'vin', 'vin_key', 'notes', 'notes_html', 'notes_excerpt', 'client', 'car_model'])
+        car_ids = [car.pk for car in cars if car.pk]
+        rollups.mark_orders(Order.objects.filter(car_id__in=car_ids))
+        Order.objects.filter(car_id__in=car_ids).update(client_id=Subquery(
+            Car.objects.filter(pk=OuterRef('car_id')).values('client_id')[:1]))
+
+    # orders and entries
+
+    def lookups_orders(self, rows):
+        car_ids = {int(row['car']) for row in rows if str(row.get('car', '')).isdigit()}
+        return dict(Car.objects.filter(pk__in=car_ids).values_list('pk', 'client_id'))
+
+    def build_orders(self, row, car_clients):
+        if not str(row.get('car', '')).isdigit() or int(row['car']) not in car_clients:
+            raise RowError('unknown car %s' % row.get('car'))
+        if not row.get('date'):
+            raise RowError('date is required')
+        return Order(
+            id=row.get('id'), date=row['date'], due_back=row.get('due_back'),
+            status=row.get('status', 0), car_id=int(row['car']), client_id=car_clients[int(row['car'])],
+        )
+
+    def save_orders(self, orders):
+        # stored totals are never taken from the file, they are recomputed
+        order_ids = [order.pk for order in orders if order.pk]
+        rollups.mark_orders(Order.objects.filter(pk__in=order_ids))
+        self.upsert(Order, orders, ['date', 'due_back', 'status', 'car', 'client'])
+        Order.objects.filter(pk__in=order_ids).refresh_totals()
+        rollups.mark_days(order.date for order in orders)
+
+    def lookups_entries(self, rows):
+        order_ids = {int(row['order']) for row in rows if str(row.get('order', '')).isdigit()}
+        return set(Order.objects.filter(pk__in=order_ids).values_list('pk', flat=True))
+
+    def build_entries(self, row, order_ids):
+        if not str(row.get('order', '')).isdigit() or int(row['order']) not in order_ids:
+            raise RowError('unknown order %s' % row.get('order'))
+        if not str(row.get('service', '')).isdigit() or int(row['service']) not in self.service_prices:
+            raise RowError('unknown service %s' % row.get('service'))
+        service_id = int(row['service'])
+        quantity = int(row.get('quantity', 1))
+        unit_price = Decimal(str(row.get('unit_price', self.service_prices[service_id])))
+        return OrderEntry(
+            id=row.get('id'), order_id=int(row['order']), service_id=service_id,
+            quantity=quantity, unit_price=unit_price, line_total=quantity * unit_price,
+        )
+
+    def save_entries(self, entries):
+        # an upserted entry may move to another order, both totals change
+        order_ids = {entry.order_id for entry in entries}
+        order_ids.update(OrderEntry.objects.filter(
+            pk__in=[entry.pk for entry in entries if entry.pk]).values_list('order_id', flat=True))
+        self.upsert(OrderEntry, entries, ['order', 'service', 'quantity', 'unit_price', 'line_total'])
+        Order.objects.filter(pk__in=order_ids).refresh_totals()
+        rollups.mark_orders(Order.objects.filter(pk__in=order_ids))
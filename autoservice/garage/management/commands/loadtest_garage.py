@@ -0,0 +1,251 @@
+import io
+import logging
+import multiprocessing
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+from typing import Any
+from urllib.parse import urlencode
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from autoservice.wsgi import application
+from garage.models import Car, CarModel, Order
+
+ANONYMOUS_MIX = [
+    ('index', 4),
+    ('order_list_search', 3),
+    ('car_model_list', 3),
+]
+CLIENT_MIX = [
+    ('index', 2),
+    ('user_orders', 4),
+    ('order_create', 1),
+    ('order_review', 1),
+]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class VirtualUser:
+    """One simulated browser: keeps its cookies and calls the WSGI application in-process."""
+
+    def __init__(self, host, seed, search_terms, client=None):
+        self.host = host
+        self.rng = random.Random(seed)
+        self.search_terms = search_terms
+        self.client = client
+        self.cookies = dict(client['cookies']) if client else {}
+        self.mix = CLIENT_MIX if client else ANONYMOUS_MIX
+
+    def call(self, method, path, data=None):
+        body = urlencode(data).encode() if data else b''
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host,
+            'HTTP_COOKIE': '; '.join(f'{name}={value}' for name, value in self.cookies.items()),
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        if 'csrftoken' in self.cookies:
+            environ['HTTP_X_CSRFTOKEN'] = self.cookies['csrftoken']
+        status = {}
+
+        def start_response(status_line, headers, exc_info=None):
+            status['code'] = int(status_line.split(' ', 1)[0])
+            for name, value in headers:
+                if name.lower() == 'set-cookie':
+                    for morsel in SimpleCookie(value).values():
+                        self.cookies[morsel.key] = morsel.value
+
+        result = application(environ, start_response)
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return status['code']
+
+    def request(self, name):
+        if name == 'index':
+            return self.call('GET', '/')
+        if name == 'order_list_search':
+            return self.call('GET', '/orders/?' + urlencode({'query': self.rng.choice(self.search_terms)}))
+        if name == 'car_model_list':
+            return self.call('GET', '/car_models/')
+        if name == 'user_orders':
+            return self.call('GET', '/orders/my/')
+        if name == 'order_create':
+            return self.call('POST', '/order/create', {
+                'car': self.rng.choice(self.client['car_ids']),
+                'due_back': (date.today() + timedelta(days=14)).isoformat(),
+                'status': 0,
+            })
+        if name == 'order_review':
+            order_id = self.rng.choice(self.client['order_ids'])
+            return self.call('POST', f'/order/{order_id}/', {
+                'content': 'Load test review',
+                'order': order_id,
+                'reviewer': self.client['user_id'],
+            })
+        raise ValueError(name)
+
+    def run(self, deadline, results):
+        names, weights = zip(*self.mix)
+        if self.client:
+            # any page with a form hands out the CSRF cookie used by the POSTs
+            self.call('GET', '/order/create')
+        while time.perf_counter() < deadline:
+            name = self.rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = self.request(name) < 400
+            except Exception:
+                ok = False
+            results[name].append((time.perf_counter() - start, ok))
+
+
+def run_worker(virtual_users, duration, queue=None):
+    connections.close_all()
+    results = defaultdict(list)
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=virtual_user.run, args=(deadline, results))
+        for virtual_user in virtual_users
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    connections.close_all()
+    if queue is None:
+        return dict(results)
+    queue.put(dict(results))
+
+
+class Command(BaseCommand):
+    help = 'Drive autoservice.wsgi.application in-process with concurrent virtual users and report latencies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=8, help='virtual users (threads) per process')
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--duration', type=float, default=10, help='seconds')
+        parser.add_argument('--logged-in', type=float, default=0.3, help='share of logged in virtual users')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--untuned', action='store_true',
+            help='run against stock SQLite settings (rollback journal, no persistent '
+                 'connections, deferred BEGIN) to compare with the tuned ones')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        total_users = options['users'] * options['processes']
+        if total_users < 1 or options['duration'] <= 0:
+            raise CommandError('--users, --processes and --duration must be positive')
+        if options['untuned']:
+            self.untune_sqlite()
+        rng = random.Random(options['seed'])
+        search_terms = list(CarModel.objects.values_list('make', flat=True).distinct()[:50]) or ['golf']
+        clients = self.prepare_clients(int(total_users * options['logged_in']), rng)
+        virtual_users = [
+            VirtualUser(options['host'], options['seed'] + index, search_terms,
+                        clients[index] if index < len(clients) else None)
+            for index in range(total_users)
+        ]
+        # the request log line would dominate the run
+        logging.getLogger('autoservice.requests').setLevel(logging.ERROR)
+
+        started = time.perf_counter()
+        per_process = [virtual_users[index::options['processes']] for index in range(options['processes'])]
+        if options['processes'] == 1:
+            worker_results = [run_worker(per_process[0], options['duration'])]
+        else:
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            queue = context.Queue()
+            workers = [
+                context.Process(target=run_worker, args=(users, options['duration'], queue))
+                for users in per_process
+            ]
+            for worker in workers:
+                worker.start()
+            worker_results = [queue.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+        elapsed = time.perf_counter() - started
+        self.report(worker_results, elapsed)
+
+    def untune_sqlite(self):
+        connection = connections['default']
+        if connection.vendor != 'sqlite':
+            raise CommandError('--untuned compares SQLite settings only')
+        connection.settings_dict.update(PRAGMAS={}, CONN_MAX_AGE=0, BEGIN_IMMEDIATE=False)
+        # the journal mode is stored in the database file
+        connection.close()
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode = DELETE')
+        connection.close()
+
+    def prepare_clients(self, count, rng):
+        cars = list(Car.objects.filter(client__isnull=False).order_by('-pk').values('pk', 'client_id')[:count * 5])
+        client_ids = list(dict.fromkeys(car['client_id'] for car in cars))[:count]
+        clients = []
+        for client_id in client_ids:
+            car_ids = [car['pk'] for car in cars if car['client_id'] == client_id]
+            order_ids = list(Order.objects.filter(car__client_id=client_id).values_list('pk', flat=True)[:20])
+            if not order_ids:
+                continue
+            login = Client()
+            login.force_login(Car.objects.get(pk=car_ids[0]).client)
+            clients.append({
+                'user_id': client_id,
+                'car_ids': car_ids,
+                'order_ids': order_ids,
+                'cookies': {name: morsel.value for name, morsel in login.cookies.items()},
+            })
+        if len(clients) < count:
+            self.stdout.write(self.style.WARNING(
+                '%d logged in virtual users requested, %d clients with orders found' % (count, len(clients))))
+        rng.shuffle(clients)
+        return clients
+
+    def report(self, worker_results, elapsed):
+        merged = defaultdict(list)
+        for results in worker_results:
+            for name, samples in results.items():
+                merged[name].extend(samples)
+        self.stdout.write('%-18s %8s %7s %9s %9s %9s %9s' % (
+            'url name', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+        total = 0
+        for name in sorted(merged):
+            samples = merged[name]
+            latencies = sorted(seconds * 1000 for seconds, _ in samples)
+            errors = sum(1 for _, ok in samples if not ok)
+            total += len(samples)
+            self.stdout.write('%-18s %8d %7d %9.1f %9.2f %9.2f %9.2f' % (
+                name, len(samples), errors, len(samples) / elapsed,
+                percentile(latencies, 0.50), percentile(latencies, 0.95), percentile(latencies, 0.99)))
+        self.stdout.write(self.style.SUCCESS('%d requests in %.1f s, %.1f req/s' % (total, elapsed, total / elapsed)))
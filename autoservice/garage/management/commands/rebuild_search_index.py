@@ -0,0 +1,15 @@
+from typing import Any
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from garage import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of cars and orders'
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        if not search.is_enabled():
+            raise CommandError('The search index needs the SQLite FTS5 extension')
+        with transaction.atomic():
+            indexed_count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS('%d cars indexed' % indexed_count))
@@ -0,0 +1,32 @@
+from typing import Any
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from garage.models import Car
+
+
+class Command(BaseCommand):
+    help = 'Sanitize Car.notes into the stored notes_html and notes_excerpt columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        cars = Car.objects.exclude(notes__isnull=True).exclude(notes='').only('pk', 'notes').order_by('pk')
+        last_pk = 0
+        car_count = 0
+        while True:
+            batch = list(cars.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            for car in batch:
+                car.render_notes()
+            with transaction.atomic():
+                Car.objects.bulk_update(batch, ['notes_html', 'notes_excerpt'])
+            last_pk = batch[-1].pk
+            car_count += len(batch)
+            if options['verbosity'] > 1:
+                self.stdout.write('%d cars rendered' % car_count)
+        self.stdout.write(self.style.SUCCESS('%d car notes rendered' % car_count))
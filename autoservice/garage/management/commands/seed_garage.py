@@ -0,0 +1,211 @@
+import random
+import string
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from garage import autocomplete, counters, rollups, search
+from garage.management.utils import manual_order_dates
+from garage.models import Car, CarModel, Order, OrderEntry, OrderReview, Service
+from user_profile.models import Profile
+
+User = get_user_model()
+
+MAKES = {
+    'Audi': ['A3', 'A4', 'A6', 'Q5', 'Q7'],
+    'BMW': ['320', '520', 'X3', 'X5'],
+    'Citroen': ['C3', 'C4', 'Berlingo'],
+    'Ford': ['Fiesta', 'Focus', 'Mondeo', 'Transit'],
+    'Honda': ['Civic', 'CR-V', 'Jazz'],
+    'Mercedes-Benz': ['A', 'C', 'E', 'Sprinter'],
+    'Opel': ['Astra', 'Corsa', 'Insignia', 'Zafira'],
+    'Peugeot': ['208', '308', '508', 'Partner'],
+    'Renault': ['Clio', 'Megane', 'Scenic', 'Kangoo'],
+    'Skoda': ['Fabia', 'Octavia', 'Superb'],
+    'Toyota': ['Yaris', 'Corolla', 'Avensis', 'RAV4', 'Prius'],
+    'Volkswagen': ['Golf', 'Passat', 'Polo', 'Touran', 'Tiguan'],
+    'Volvo': ['S60', 'V70', 'XC60', 'XC90'],
+}
+ENGINES = ['1.2', '1.4', '1.6', '1.9 TDI', '2.0', '2.0 TDI', '2.5', '3.0', 'electric', 'hybrid']
+SERVICES = [
+    'Oil change', 'Oil filter', 'Air filter', 'Cabin filter', 'Fuel filter', 'Brake pads',
+    'Brake discs', 'Brake fluid', 'Timing belt', 'Spark plugs', 'Glow plugs', 'Battery',
+    'Wheel alignment', 'Tyre change', 'Tyre balancing', 'Diagnostics', 'Air conditioning refill',
+    'Coolant', 'Clutch', 'Shock absorbers', 'Exhaust', 'Headlight bulbs', 'Wipers', 'Gearbox oil',
+]
+FIRST_NAMES = ['Jonas', 'Petras', 'Tomas', 'Mantas', 'Lukas', 'Andrius', 'Ona', 'Rasa', 'Ieva', 'Greta',
+               'Asta', 'Jurate', 'Darius', 'Paulius', 'Egle', 'Laura', 'Marius', 'Rokas', 'Vilte', 'Simona']
+LAST_NAMES = ['Kazlauskas', 'Jankauskas', 'Petrauskas', 'Stankevicius', 'Vasiliauskas', 'Zukauskas',
+              'Butkus', 'Paulauskas', 'Urbonas', 'Kavaliauskas', 'Baranauskas', 'Navickas']
+REVIEWS = ['Quick and tidy work.', 'Car is ready, thank you!', 'Please call me before replacing parts.',
+           'Waiting for the parts to arrive.', 'Price was higher than expected.', 'Great service as always.']
+# (status, weight): most historical orders are done
+STATUS_WEIGHTS = [(0, 5), (1, 5), (2, 5), (3, 80), (7, 5)]
+VIN_CHARS = 'ABCDEFGHJKLMNPRSTUVWXYZ0123456789'
+
+
+def plate_number(index):
+    letters = ''
+    number = index // 1000
+    for _ in range(3):
+        number, remainder = divmod(number, 26)
+        letters = string.ascii_uppercase[remainder] + letters
+    return f'{letters}{index % 1000:03d}'
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic garage dataset for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--cars', type=int, help='default: two per user')
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=365, help='spread orders over this many past days')
+        parser.add_argument('--max-entries', type=int, default=4, help='entries per order, 1..N')
+        parser.add_argument('--review-ratio', type=float, default=0.2)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default='password', help='password of the generated users')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        if options['users'] < 1 or options['orders'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--users and --batch-size must be positive, --orders not negative')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+
+        car_models = self.create_car_models()
+        services = self.create_services()
+        user_ids = self.create_users(options['users'], options['password'])
+        cars = self.create_cars(options['cars'] or options['users'] * 2, user_ids, car_models)
+        with manual_order_dates():
+            order_count, entry_count, review_count = self.create_orders(
+                options['orders'], cars, user_ids, services,
+                options['days'], options['max_entries'], options['review_ratio'],
+            )
+
+        if search.is_enabled():
+            with transaction.atomic():
+                search.rebuild()
+        counters.invalidate()
+        autocomplete.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            '%d users, %d cars, %d orders, %d entries and %d reviews created' % (
+                len(user_ids), len(cars), order_count, entry_count, review_count)
+        ))
+
+    def progress(self, label, done, total):
+        if self.verbosity > 1:
+            self.stdout.write('%s: %d / %d' % (label, done, total))
+
+    def create_car_models(self):
+        car_models = [
+            CarModel(make=make, model=model, engine=engine, year=year)
+            for make, models in MAKES.items()
+            for model in models
+            for engine in self.rng.sample(ENGINES, 3)
+            for year in self.rng.sample(range(2000, 2024), 2)
+        ]
+        return CarModel.objects.bulk_create(car_models, batch_size=self.batch_size)
+
+    def create_services(self):
+        services = [
+            Service(name=name, price=Decimal(self.rng.randrange(500, 50000)) / 100)
+            for name in SERVICES
+        ]
+        return Service.objects.bulk_create(services, batch_size=self.batch_size)
+
+    def create_users(self, count, password):
+        password = make_password(password)
+        offset = User.objects.count()
+        user_ids = []
+        for start in range(0, count, self.batch_size):
+            users = []
+            for index in range(offset + start, offset + min(start + self.batch_size, count)):
+                first_name = self.rng.choice(FIRST_NAMES)
+                last_name = self.rng.choice(LAST_NAMES)
+                users.append(User(
+                    username=f'seed_user_{index}',
+                    email=f'seed_user_{index}@example.com',
+                    first_name=first_name,
+                    last_name=last_name,
+                    password=password,
+                ))
+            with transaction.atomic():
+                users = User.objects.bulk_create(users)
+                Profile.objects.bulk_create([Profile(user=user) for user in users])
+            user_ids.extend(user.pk for user in users)
+            self.progress('users', len(user_ids), count)
+        return user_ids
+
+    def create_cars(self, count, user_ids, car_models):
+        offset = Car.objects.count()
+        car_clients = []
+        for start in range(0, count, self.batch_size):
+            cars = [
+                Car(
+                    plate_nr=plate_number(offset + index),
+                    vin=''.join(self.rng.choices(VIN_CHARS, k=17)),
+                    car_model=self.rng.choice(car_models),
+                    client_id=self.rng.choice(user_ids),
+                )
+                for index in range(start, min(start + self.batch_size, count))
+            ]
+            for car in cars:
+                car.set_identifier_keys()
+            with transaction.atomic():
+                cars = Car.objects.bulk_create(cars)
+            car_clients.extend((car.pk, car.client_id) for car in cars)
+            self.progress('cars', len(car_clients), count)
+        return car_clients
+
+    def create_orders(self, count, cars, user_ids, services, days, max_entries, review_ratio):
+        statuses, weights = zip(*STATUS_WEIGHTS)
+        today = date.today()
+        entry_count = review_count = 0
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            orders, order_entries, order_reviews = [], [], []
+            for status in self.rng.choices(statuses, weights, k=size):
+                order_date = today - timedelta(days=self.rng.randrange(days))
+                entries = []
+                for service in self.rng.sample(services, self.rng.randint(1, max_entries)):
+                    quantity = self.rng.randint(1, 4)
+                    entries.append(OrderEntry(
+                        service=service, quantity=quantity,
+                        unit_price=service.price, line_total=quantity * service.price,
+                    ))
+                car_id, client_id = self.rng.choice(cars)
+                orders.append(Order(
+                    car_id=car_id,
+                    client_id=client_id,
+                    date=order_date,
+                    due_back=order_date + timedelta(days=self.rng.randint(1, 21)),
+                    status=status,
+                    total=sum(entry.line_total for entry in entries),
+                    entry_count=len(entries),
+                ))
+                order_entries.append(entries)
+                order_reviews.append(self.rng.random() < review_ratio)
+            with transaction.atomic():
+                orders = Order.objects.bulk_create(orders)
+                entries, reviews = [], []
+                for order, order_entry_list, reviewed in zip(orders, order_entries, order_reviews):
+                    for entry in order_entry_list:
+                        entry.order = order
+                        entries.append(entry)
+                    if reviewed:
+                        reviews.append(OrderReview(
+                            order=order, reviewer_id=self.rng.choice(user_ids),
+                            content=self.rng.choice(REVIEWS),
+                        ))
+                OrderEntry.objects.bulk_create(entries)
+                OrderReview.objects.bulk_create(reviews)
+                rollups.mark_days(order.date for order in orders)
+            entry_count += len(entries)
+            review_count += len(reviews)
+            self.progress('orders', start + size, count)
+        return count, entry_count, review_count
@@ -0,0 +1,46 @@
+from typing import Any
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Abs
+from garage.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Backfill or verify the stored Order.total and Order.entry_count columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='only report orders whose stored totals are out of date')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        last_pk = Order.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        order_count = 0
+        mismatch_count = 0
+        for start in range(0, last_pk + 1, batch_size):
+            batch = Order.objects.filter(pk__gte=start, pk__lt=start + batch_size)
+            if options['verify']:
+                order_count += batch.count()
+                mismatch_count += batch.with_totals().annotate(
+                    live_count=Count('entries'),
+                    total_diff=Abs(F('total') - F('total_amount')),
+                ).filter(
+                    # SQLite sums decimals as floats, so allow for rounding noise
+                    Q(total_diff__gte=Decimal('0.005')) | ~Q(entry_count=F('live_count'))
+                ).count()
+            else:
+                with transaction.atomic():
+                    order_count += batch.refresh_totals()
+        if options['verify']:
+            # a non-zero exit status, so that the check can gate a deploy
+            if mismatch_count:
+                raise CommandError('%d orders checked, %d out of date' % (order_count, mismatch_count))
+            self.stdout.write(self.style.SUCCESS('%d orders checked, 0 out of date' % order_count))
+        else:
+            self.stdout.write(self.style.SUCCESS('%d order totals refreshed' % order_count))
@@ -0,0 +1,20 @@
+from typing import Any
+from django.core.management.base import BaseCommand, CommandError
+from garage import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the revenue rollups of the days changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='recompute every day')
+        parser.add_argument('--batch-size', type=int, default=31, help='days per transaction')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        if options['all']:
+            day_count = rollups.rebuild(options['batch_size'])
+        else:
+            day_count = rollups.update(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('%d days refreshed' % day_count))
@@ -0,0 +1,13 @@
+from contextlib import contextmanager
+from garage.models import Order
+
+
+@contextmanager
+def manual_order_dates():
+    # Order.date is auto_now_add, switch it off so bulk written orders keep their own dates
+    field = Order._meta.get_field('date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:07
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Order = apps.get_model('garage', 'Order')
+    OrderEntry = apps.get_model('garage', 'OrderEntry')
+    entries = OrderEntry.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    line_total = ExpressionWrapper(
+        F('quantity') * F('service__price'),
+        output_field=DecimalField(max_digits=18, decimal_places=2),
+    )
+    Order.objects.update(
+        total=Coalesce(
+            Subquery(entries.annotate(total=Sum(line_total)).values('total')),
+            Value(0),
+            output_field=DecimalField(max_digits=18, decimal_places=2),
+        ),
+        entry_count=Coalesce(
+            Subquery(entries.annotate(count=Count('pk')).values('count')),
+            Value(0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0015_alter_car_notes_orderreview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='entry_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='entry count'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=18, verbose_name='total'),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
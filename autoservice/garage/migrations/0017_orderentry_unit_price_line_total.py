@@ -0,0 +1,34 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:07
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def snapshot_prices(apps, schema_editor):
+    OrderEntry = apps.get_model('garage', 'OrderEntry')
+    Service = apps.get_model('garage', 'Service')
+    OrderEntry.objects.filter(unit_price__isnull=True).update(
+        unit_price=Subquery(Service.objects.filter(pk=OuterRef('service_id')).values('price')[:1])
+    )
+    OrderEntry.objects.update(line_total=F('quantity') * F('unit_price'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0016_order_total_entry_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderentry',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=18, verbose_name='line total'),
+        ),
+        migrations.AddField(
+            model_name='orderentry',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=18, null=True, verbose_name='unit price'),
+        ),
+        migrations.RunPython(snapshot_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:31
+
+from django.db import migrations
+
+# The full-text index as it was created here, kept in the migration so later
+# changes to garage.search do not change its history. Without FTS5 the views
+# search with icontains filters and no index is created.
+
+
+def has_fts5(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(option == 'ENABLE_FTS5' for option, in cursor.fetchall())
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if not has_fts5(connection):
+        return
+    Car = apps.get_model('garage', 'Car')
+    car_table = connection.ops.quote_name(Car._meta.db_table)
+    user_table = connection.ops.quote_name(Car._meta.get_field('client').related_model._meta.db_table)
+    car_model_table = connection.ops.quote_name(Car._meta.get_field('car_model').related_model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS garage_search USING fts5("
+            "plate_nr, vin, client, make, model, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        cursor.execute("DELETE FROM garage_search")
+        cursor.execute(
+            f"INSERT INTO garage_search (rowid, plate_nr, vin, client, make, model) "
+            f"SELECT c.id, c.plate_nr, c.vin, "
+            f"COALESCE(u.first_name, '') || ' ' || COALESCE(u.last_name, ''), "
+            f"COALESCE(m.make, ''), COALESCE(m.model, '') "
+            f"FROM {car_table} c "
+            f"LEFT JOIN {user_table} u ON u.id = c.client_id "
+            f"LEFT JOIN {car_model_table} m ON m.id = c.car_model_id"
+        )
+        cursor.execute("INSERT INTO garage_search (garage_search) VALUES ('optimize')")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS garage_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0017_orderentry_unit_price_line_total'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def mark_order_days(apps, schema_editor):
+    # the first update_revenue_rollups run computes every day with orders
+    Order = apps.get_model('garage', 'Order')
+    StaleRollupDay = apps.get_model('garage', 'StaleRollupDay')
+    days = Order.objects.order_by().values_list('date', flat=True).distinct()
+    StaleRollupDay.objects.bulk_create([StaleRollupDay(day=day, marked_at=timezone.now()) for day in days])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0018_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleRollupDay',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False, verbose_name='day')),
+                ('marked_at', models.DateTimeField(auto_now=True, verbose_name='marked at')),
+            ],
+            options={
+                'verbose_name': 'stale rollup day',
+                'verbose_name_plural': 'stale rollup days',
+            },
+        ),
+        migrations.CreateModel(
+            name='RevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='day')),
+                ('make', models.CharField(blank=True, default='', max_length=50, verbose_name='make')),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'In a Row'), (1, 'Working'), (2, 'Pending'), (3, 'Done'), (7, 'Cancelled')], verbose_name='status')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='revenue')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='quantity')),
+                ('entry_count', models.PositiveIntegerField(default=0, verbose_name='entry count')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_rollups', to='garage.service', verbose_name='service')),
+            ],
+            options={
+                'verbose_name': 'revenue rollup',
+                'verbose_name_plural': 'revenue rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='revenuerollup',
+            constraint=models.UniqueConstraint(fields=('day', 'service', 'make', 'status'), name='garage_revenue_rollup_unique'),
+        ),
+        migrations.RunPython(mark_order_days, migrations.RunPython.noop),
+    ]
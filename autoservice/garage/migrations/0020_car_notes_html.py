@@ -0,0 +1,23 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0019_revenue_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='notes_excerpt',
+            field=models.CharField(blank=True, default='', editable=False, max_length=300, verbose_name='notes excerpt'),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='notes_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='notes HTML'),
+        ),
+    ]
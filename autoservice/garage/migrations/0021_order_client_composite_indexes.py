@@ -0,0 +1,45 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_car_clients(apps, schema_editor):
+    Car = apps.get_model('garage', 'Car')
+    Order = apps.get_model('garage', 'Order')
+    Order.objects.update(client_id=models.Subquery(
+        Car.objects.filter(pk=models.OuterRef('car_id')).values('client_id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('garage', '0020_car_notes_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='client',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to=settings.AUTH_USER_MODEL, verbose_name='client'),
+        ),
+        migrations.RunPython(copy_car_clients, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['plate_nr'], name='garage_car_plate_nr_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['vin'], name='garage_car_vin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['date', 'id'], name='garage_order_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['client', 'date', 'id'], name='garage_order_client_date_idx'),
+        ),
+    ]
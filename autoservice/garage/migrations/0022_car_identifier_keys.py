@@ -0,0 +1,61 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:30
+
+import re
+from django.db import migrations, models
+
+
+def normalize(value):
+    # garage.models.normalize_identifier at the time of this migration
+    return re.sub(r'[\s-]+', '', value or '').upper()
+
+
+def fill_identifier_keys(apps, schema_editor):
+    Car = apps.get_model('garage', 'Car')
+    cars = Car.objects.only('pk', 'plate_nr', 'vin').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(cars.filter(pk__gt=last_pk)[:2000])
+        if not batch:
+            break
+        for car in batch:
+            car.plate_key = normalize(car.plate_nr)
+            car.vin_key = normalize(car.vin)
+        Car.objects.bulk_update(batch, ['plate_key', 'vin_key'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0021_order_client_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='car',
+            name='garage_car_plate_nr_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='car',
+            name='garage_car_vin_idx',
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='plate_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50, verbose_name='plate number key'),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='vin_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50, verbose_name='VIN key'),
+        ),
+        migrations.RunPython(fill_identifier_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['plate_key'], name='garage_car_plate_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['vin_key'], name='garage_car_vin_key_idx'),
+        ),
+    ]
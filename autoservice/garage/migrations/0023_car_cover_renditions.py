@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0022_car_identifier_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='cover_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='cover renditions'),
+        ),
+    ]
@@ -0,0 +1,153 @@
+# Generated by Django 4.2.1 on 2026-10-18 21:12
+
+import re
+from html import escape
+from html.parser import HTMLParser
+from django.db import migrations
+from django.utils.text import Truncator
+
+# Fills Car.notes_html and notes_excerpt, added empty by 0020, for the cars
+# saved before it. The sanitizer is a copy of garage.notes as it was here so
+# later changes to that module do not change what this migration does. Run
+# the render_car_notes command to re-render the notes with the current one.
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'code', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img',
+    'li', 'ol', 'p', 'pre', 's', 'span', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot',
+    'th', 'thead', 'tr', 'u', 'ul',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+DROPPED_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'textarea', 'select'}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+}
+ALLOWED_STYLES = {'color', 'background-color', 'text-align', 'text-decoration', 'padding-left'}
+SAFE_STYLE_VALUE = re.compile(r'^[#\w\s.,%()-]+$')
+SAFE_URL = re.compile(r'^(https?://|mailto:|/|#|[^:/?#]+([/?#]|$))', re.IGNORECASE)
+IMPLICITLY_CLOSED = {'li': {'li'}, 'p': {'p'}, 'td': {'td', 'th'}, 'th': {'td', 'th'}, 'tr': {'tr', 'td', 'th'}}
+BLOCK_TAGS = {'blockquote', 'br', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'li', 'p', 'pre', 'td', 'th', 'tr'}
+EXCERPT_LENGTH = 200
+BATCH_SIZE = 1000
+
+
+def clean_style(value):
+    declarations = []
+    for declaration in value.split(';'):
+        name, _, style_value = declaration.partition(':')
+        name, style_value = name.strip().lower(), style_value.strip()
+        lowered = style_value.lower()
+        if name in ALLOWED_STYLES and SAFE_STYLE_VALUE.match(style_value) \
+                and 'url' not in lowered and 'expression' not in lowered:
+            declarations.append(f'{name}: {style_value}')
+    return '; '.join(declarations)
+
+
+class NotesSanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.html = []
+        self.text = []
+        self.open_tags = []
+        self.dropped_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            self.dropped_depth += 1
+            return
+        if self.dropped_depth:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in ALLOWED_TAGS:
+            return
+        while self.open_tags and self.open_tags[-1] in IMPLICITLY_CLOSED.get(tag, ()):
+            self.html.append(f'</{self.open_tags.pop()}>')
+        cleaned = []
+        for name, value in attrs:
+            value = (value or '').strip()
+            if name == 'style':
+                value = clean_style(value)
+            elif name not in ALLOWED_ATTRIBUTES.get(tag, ()):
+                continue
+            elif name in ('href', 'src') and not SAFE_URL.match(value):
+                continue
+            if value:
+                cleaned.append(f' {name}="{escape(value)}"')
+        if tag == 'a' and any(attribute.startswith(' href=') for attribute in cleaned):
+            cleaned.append(' rel="nofollow noopener"')
+        self.html.append(f'<{tag}{"".join(cleaned)}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            return
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS:
+            self.dropped_depth = max(self.dropped_depth - 1, 0)
+            return
+        if self.dropped_depth:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in self.open_tags:
+            return
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.html.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropped_depth:
+            return
+        self.html.append(escape(data, quote=False))
+        self.text.append(data)
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.html.append(f'</{self.open_tags.pop()}>')
+
+
+def render(notes):
+    if not notes:
+        return '', ''
+    sanitizer = NotesSanitizer()
+    sanitizer.feed(notes)
+    sanitizer.close()
+    text = ' '.join(''.join(sanitizer.text).split())
+    return ''.join(sanitizer.html).strip(), Truncator(text).chars(EXCERPT_LENGTH)
+
+
+def render_car_notes(apps, schema_editor):
+    Car = apps.get_model('garage', 'Car')
+    cars = Car.objects.using(schema_editor.connection.alias).exclude(notes__isnull=True).exclude(notes='') \
+        .filter(notes_html='').only('pk', 'notes').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(cars.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        for car in batch:
+            car.notes_html, car.notes_excerpt = render(car.notes)
+        Car.objects.using(schema_editor.connection.alias).bulk_update(batch, ['notes_html', 'notes_excerpt'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0023_car_cover_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(render_car_notes, migrations.RunPython.noop),
+    ]
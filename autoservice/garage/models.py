@@ -1,12 +1,22 @@
+import re
 from django.contrib.auth import get_user_model
 from datetime import date
 from django.db import models
+from django.db.models import Count, DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 from tinymce.models import HTMLField
+from . notes import render as render_notes
 
 
 User = get_user_model()
+IDENTIFIER_SEPARATORS = re.compile(r'[\s-]+')
+
+
+def normalize_identifier(value):
+    """Plate number or VIN as stored for lookups: uppercase, no spaces or dashes."""
+    return IDENTIFIER_SEPARATORS.sub('', value or '').upper()
 
 # Create your models here.
 
@@ -30,7 +40,13 @@ class CarModel(models.Model):
 class Car(models.Model):
     plate_nr = models.CharField(_("plate number"), max_length=50)
     vin = models.CharField(_("VIN"), max_length=50)
+    # normalize_identifier() of plate_nr and vin, for exact and prefix lookups
+    plate_key = models.CharField(_("plate number key"), max_length=50, blank=True, default='', editable=False)
+    vin_key = models.CharField(_("VIN key"), max_length=50, blank=True, default='', editable=False)
     notes = HTMLField(_("notes"), max_length=8000, blank=True, null=True)
+    # sanitized once on save, see garage.notes
+    notes_html = models.TextField(_("notes HTML"), blank=True, default='', editable=False)
+    notes_excerpt = models.CharField(_("notes excerpt"), max_length=300, blank=True, default='', editable=False)
     car_model = models.ForeignKey(
         CarModel,
         verbose_name=_("car model"),
@@ -50,12 +66,37 @@ class Car(models.Model):
     class Meta:
         verbose_name = _("car")
         verbose_name_plural = _("cars")
+        indexes = [
+            models.Index(fields=['plate_key'], name='garage_car_plate_key_idx'),
+            models.Index(fields=['vin_key'], name='garage_car_vin_key_idx'),
+        ]
 
     def __str__(self):
         return self.plate_nr
 
     def get_absolute_url(self):
         return reverse("car_detail", kwargs={"pk": self.pk})
+
+    def render_notes(self):
+        self.notes_html, self.notes_excerpt = render_notes(self.notes)
+
+    def set_identifier_keys(self):
+        self.plate_key = normalize_identifier(self.plate_nr)
+        self.vin_key = normalize_identifier(self.vin)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'notes' in update_fields:
+            self.render_notes()
+            if update_fields is not None:
+                update_fields = {*update_fields, 'notes_html', 'notes_excerpt'}
+        if update_fields is None or {'plate_nr', 'vin'} & set(update_fields):
+            self.set_identifier_keys()
+            if update_fields is not None:
+                update_fields = {*update_fields, 'plate_key', 'vin_key'}
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
     
     cover = models.ImageField(
         _("cover"),
@@ -63,7 +104,35 @@ class Car(models.Model):
         null=True,
         blank=True,
     )
+    # widths of the resized copies of the cover, recorded by garage.covers.build()
+    cover_renditions = models.JSONField(_("cover renditions"), default=dict, blank=True, editable=False)
     
+class OrderQuerySet(models.QuerySet):
+    def with_totals(self):
+        return self.annotate(
+            total_amount=Coalesce(
+                Sum('entries__line_total'),
+                Value(0),
+                output_field=DecimalField(max_digits=18, decimal_places=2),
+            )
+        )
+
+    def refresh_totals(self):
+        # recompute the stored total/entry_count columns with one UPDATE
+        entries = OrderEntry.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        return self.update(
+            total=Coalesce(
+                Subquery(entries.annotate(total=Sum('line_total')).values('total')),
+                Value(0),
+                output_field=DecimalField(max_digits=18, decimal_places=2),
+            ),
+            entry_count=Coalesce(
+                Subquery(entries.annotate(count=Count('pk')).values('count')),
+                Value(0),
+            ),
+        )
+
+
 class Order(models.Model):
     date = models.DateField(_("date"), auto_now=False, auto_now_add=True)
     # amount = models.DecimalField(_("amount"), max_digits=18, decimal_places=2)
@@ -73,11 +142,22 @@ class Order(models.Model):
         on_delete=models.CASCADE,
         related_name='orders') 
     due_back = models.DateField(_("due back"), null=True, blank=True, db_index=True)
+    # copy of car.client, so that a client's orders are read from one index in date order
+    client = models.ForeignKey(
+        User,
+        verbose_name=_("client"),
+        on_delete=models.SET_NULL,
+        related_name='orders',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False)
+    total = models.DecimalField(
+        _("total"), max_digits=18, decimal_places=2, default=0, db_index=True, editable=False)
+    entry_count = models.PositiveIntegerField(_("entry count"), default=0, editable=False)
+
+    objects = OrderQuerySet.as_manager()
 
-    @property
-    def client(self):
-        return self.car.client
-    
     @property
     def is_overdue(self):
         if self.due_back and date.today() > self.due_back:
@@ -86,22 +166,35 @@ class Order(models.Model):
     
     @property
     def amount(self):
-        order_entries = OrderEntry.objects.filter(order=self.id)
-        price = 0
-        for order_entry in order_entries:
-            price += order_entry.price
-        return price
+        # with_totals() annotates a live sum, otherwise use the stored column
+        if hasattr(self, 'total_amount'):
+            return self.total_amount
+        return self.total
 
     class Meta:
         ordering = ['date', 'id']
         verbose_name = _("order")
         verbose_name_plural = _("orders")
+        indexes = [
+            # the default ordering, cursor pages seek on it
+            models.Index(fields=['date', 'id'], name='garage_order_date_id_idx'),
+            # a client's orders in the default ordering
+            models.Index(fields=['client', 'date', 'id'], name='garage_order_client_date_idx'),
+        ]
 
     def __str__(self):
         return f'{self.date} {self.car}'
 
     def get_absolute_url(self):
         return reverse("order_detail", kwargs={"pk": self.pk})
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'car' in update_fields:
+            self.client_id = self.car.client_id if self.car_id else None
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'client'}
+        super().save(*args, **kwargs)
     
     STATUS_CHOICES = (
         (0, _('In a Row')),
@@ -134,7 +227,10 @@ class Service(models.Model):
 
 class OrderEntry(models.Model):
     quantity = models.IntegerField(_("quantity"))
-    # price = models.DecimalField(_("price"), max_digits=18, decimal_places=2)
+    unit_price = models.DecimalField(
+        _("unit price"), max_digits=18, decimal_places=2, null=True, blank=True)
+    line_total = models.DecimalField(
+        _("line total"), max_digits=18, decimal_places=2, default=0, editable=False)
     service = models.ForeignKey(
         Service,
         verbose_name=_("service"),
@@ -148,7 +244,7 @@ class OrderEntry(models.Model):
     
     @property
     def price(self):
-        return self.quantity * self.service.price
+        return self.line_total
 
     class Meta:
         verbose_name = _("order entry")
@@ -160,10 +256,23 @@ class OrderEntry(models.Model):
     def get_absolute_url(self):
         return reverse("orderentry_detail", kwargs={"pk": self.pk})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_price = (instance.__dict__.get('service_id'), instance.__dict__.get('unit_price'))
+        return instance
+
     def save(self, *args, **kwargs):
-        if self.price == 0:
-            self.price = self.service.price
+        # the catalog price is copied once, later price changes keep old orders intact.
+        # An entry switched to another service takes that service's price, unless
+        # a price was given along with it
+        loaded_service_id, loaded_unit_price = getattr(self, '_loaded_price', (self.service_id, None))
+        if self.unit_price is None or (
+                self.service_id != loaded_service_id and self.unit_price == loaded_unit_price):
+            self.unit_price = self.service.price
+        self.line_total = self.quantity * self.unit_price
         super().save(*args, **kwargs)
+        self._loaded_price = (self.service_id, self.unit_price)
 
 class OrderReview(models.Model):
     order = models.ForeignKey(
@@ -191,3 +300,42 @@ class OrderReview(models.Model):
 
     def get_absolute_url(self):
         return reverse("orderReview_detail", kwargs={"pk": self.pk})
+
+
+class RevenueRollup(models.Model):
+    # one row per day, service, car make and order status, kept by garage.rollups
+    day = models.DateField(_("day"))
+    service = models.ForeignKey(
+        Service,
+        verbose_name=_("service"),
+        on_delete=models.CASCADE,
+        related_name='revenue_rollups')
+    make = models.CharField(_("make"), max_length=50, blank=True, default='')
+    status = models.PositiveSmallIntegerField(_("status"), choices=Order.STATUS_CHOICES)
+    revenue = models.DecimalField(_("revenue"), max_digits=18, decimal_places=2, default=0)
+    quantity = models.PositiveIntegerField(_("quantity"), default=0)
+    entry_count = models.PositiveIntegerField(_("entry count"), default=0)
+
+    class Meta:
+        verbose_name = _("revenue rollup")
+        verbose_name_plural = _("revenue rollups")
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'service', 'make', 'status'], name='garage_revenue_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} {self.service_id} {self.make} {self.status}'
+
+
+class StaleRollupDay(models.Model):
+    # days whose rollups have to be recomputed by the next update_revenue_rollups run
+    day = models.DateField(_("day"), primary_key=True)
+    marked_at = models.DateTimeField(_("marked at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("stale rollup day")
+        verbose_name_plural = _("stale rollup days")
+
+    def __str__(self):
+        return f'{self.day}'
@@ -0,0 +1,126 @@
+import re
+from html import escape
+from html.parser import HTMLParser
+from django.utils.text import Truncator
+
+# Car.notes come from the TinyMCE editor. They are sanitized once when the car
+# is saved, pages output the stored result as it is.
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'code', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img',
+    'li', 'ol', 'p', 'pre', 's', 'span', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot',
+    'th', 'thead', 'tr', 'u', 'ul',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+# the content of these is dropped together with the tag
+DROPPED_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'textarea', 'select'}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+}
+ALLOWED_STYLES = {'color', 'background-color', 'text-align', 'text-decoration', 'padding-left'}
+SAFE_STYLE_VALUE = re.compile(r'^[#\w\s.,%()-]+$')
+SAFE_URL = re.compile(r'^(https?://|mailto:|/|#|[^:/?#]+([/?#]|$))', re.IGNORECASE)
+# an open tag of these is closed by the start of its sibling, e.g. <li>one<li>two
+IMPLICITLY_CLOSED = {'li': {'li'}, 'p': {'p'}, 'td': {'td', 'th'}, 'th': {'td', 'th'}, 'tr': {'tr', 'td', 'th'}}
+BLOCK_TAGS = {'blockquote', 'br', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'li', 'p', 'pre', 'td', 'th', 'tr'}
+EXCERPT_LENGTH = 200
+
+
+def clean_style(value):
+    declarations = []
+    for declaration in value.split(';'):
+        name, _, style_value = declaration.partition(':')
+        name, style_value = name.strip().lower(), style_value.strip()
+        lowered = style_value.lower()
+        if name in ALLOWED_STYLES and SAFE_STYLE_VALUE.match(style_value) \
+                and 'url' not in lowered and 'expression' not in lowered:
+            declarations.append(f'{name}: {style_value}')
+    return '; '.join(declarations)
+
+
+class NotesSanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.html = []
+        self.text = []
+        self.open_tags = []
+        self.dropped_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            self.dropped_depth += 1
+            return
+        if self.dropped_depth:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in ALLOWED_TAGS:
+            return
+        while self.open_tags and self.open_tags[-1] in IMPLICITLY_CLOSED.get(tag, ()):
+            self.html.append(f'</{self.open_tags.pop()}>')
+        cleaned = []
+        for name, value in attrs:
+            value = (value or '').strip()
+            if name == 'style':
+                value = clean_style(value)
+            elif name not in ALLOWED_ATTRIBUTES.get(tag, ()):
+                continue
+            elif name in ('href', 'src') and not SAFE_URL.match(value):
+                continue
+            if value:
+                cleaned.append(f' {name}="{escape(value)}"')
+        if tag == 'a' and any(attribute.startswith(' href=') for attribute in cleaned):
+            cleaned.append(' rel="nofollow noopener"')
+        self.html.append(f'<{tag}{"".join(cleaned)}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        # a self-closed <iframe/> has no content to drop
+        if tag in DROPPED_TAGS:
+            return
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS:
+            self.dropped_depth = max(self.dropped_depth - 1, 0)
+            return
+        if self.dropped_depth:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in self.open_tags:
+            return
+        # close the tags left open inside this one as well
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.html.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropped_depth:
+            return
+        self.html.append(escape(data, quote=False))
+        self.text.append(data)
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.html.append(f'</{self.open_tags.pop()}>')
+
+
+def render(notes):
+    """Return the sanitized HTML and a plain-text excerpt of the notes."""
+    if not notes:
+        return '', ''
+    sanitizer = NotesSanitizer()
+    sanitizer.feed(notes)
+    sanitizer.close()
+    text = ' '.join(''.join(sanitizer.text).split())
+    return ''.join(sanitizer.html).strip(), Truncator(text).chars(EXCERPT_LENGTH)
@@ -0,0 +1,143 @@
+import base64
+import binascii
+import collections.abc
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+
+
+class CursorPage(collections.abc.Sequence):
+    has_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.paginator.encode_cursor('n', self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.encode_cursor('p', self.object_list[0])
+
+    @property
+    def last_cursor(self):
+        return self.paginator.encode_cursor('p')
+
+
+class CursorPaginator:
+    """
+    Keyset paginator: pages continue from the ordering key of the last seen row
+    instead of an OFFSET, so every page costs the same and no COUNT(*) is run.
+    The ordering must end with a unique field, e.g. ('date', 'id').
+    """
+
+    def __init__(self, object_list: QuerySet, per_page, ordering):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = list(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+    def encode_cursor(self, direction, obj=None):
+        key = None
+        if obj is not None:
+            key = [self.object_list.model._meta.get_field(field).value_to_string(obj)
+                   for field in self.fields]
+        raw = json.dumps([direction, key], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, key = json.loads(raw)
+            if direction not in ('n', 'p'):
+                raise ValueError(direction)
+            if key is not None:
+                if len(key) != len(self.fields):
+                    raise ValueError(key)
+                key = [self.object_list.model._meta.get_field(field).to_python(value)
+                       for field, value in zip(self.fields, key)]
+            return direction, key
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            return None, None
+
+    def _after(self, key, reverse=False):
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), per field direction
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith('-') != reverse
+            lookup = f'{self.fields[index]}__{"lt" if descending else "gt"}'
+            equal = {self.fields[i]: key[i] for i in range(index)}
+            condition |= Q(**equal, **{lookup: key[index]})
+        if len(self.ordering) > 1:
+            # a >= x lets the database seek the index instead of sorting the OR branches
+            descending = self.ordering[0].startswith('-') != reverse
+            condition &= Q(**{f'{self.fields[0]}__{"lte" if descending else "gte"}': key[0]})
+        return condition
+
+    def _reversed_ordering(self):
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+
+    def _page_queryset(self, cursor):
+        direction, key = self.decode_cursor(cursor) if cursor else (None, None)
+        if direction == 'p':
+            qs = self.object_list.order_by(*self._reversed_ordering())
+            if key is not None:
+                qs = qs.filter(self._after(key, reverse=True))
+        else:
+            qs = self.object_list.order_by(*self.ordering)
+            if key is not None:
+                qs = qs.filter(self._after(key))
+        return qs[:self.per_page + 1], direction, key
+
+    def _page(self, rows, direction, key):
+        if direction == 'p':
+            has_previous = len(rows) > self.per_page
+            object_list = rows[:self.per_page][::-1]
+            return CursorPage(object_list, self, has_next=key is not None, has_previous=has_previous)
+        return CursorPage(rows[:self.per_page], self, has_next=len(rows) > self.per_page,
+                          has_previous=key is not None)
+
+    def get_page(self, cursor=None):
+        qs, direction, key = self._page_queryset(cursor)
+        return self._page(list(qs), direction, key)
+
+    async def aget_page(self, cursor=None):
+        qs, direction, key = self._page_queryset(cursor)
+        return self._page([obj async for obj in qs], direction, key)
+
+
+class CursorPaginationMixin:
+    """ListView mixin paginating querysets by cursor, other lists (e.g. ranked search) by page number."""
+    cursor_ordering = None
+
+    def paginate_queryset(self, queryset, page_size):
+        if not isinstance(queryset, QuerySet):
+            return super().paginate_queryset(queryset, page_size)
+        ordering = self.cursor_ordering or queryset.model._meta.ordering
+        paginator = CursorPaginator(queryset, page_size, ordering)
+        page = paginator.get_page(self.request.GET.get('cursor'))
+        return (paginator, page, page.object_list, page.has_other_pages())
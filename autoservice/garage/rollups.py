@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from . models import Order, OrderEntry, RevenueRollup, StaleRollupDay
+
+# Revenue per day, service, car make and status is read from RevenueRollup.
+# Writes mark the days they touch as stale (signals, bulk commands), the
+# update_revenue_rollups command recomputes only those days.
+
+
+def mark_days(days):
+    days = {day for day in days if day}
+    if days:
+        StaleRollupDay.objects.bulk_create(
+            [StaleRollupDay(day=day, marked_at=timezone.now()) for day in days],
+            update_conflicts=True, unique_fields=['day'], update_fields=['marked_at'],
+        )
+
+
+def mark_orders(orders):
+    mark_days(orders.order_by().values_list('date', flat=True).distinct())
+
+
+def mark_all():
+    mark_orders(Order.objects.all())
+
+
+def compute(days):
+    rows = OrderEntry.objects.filter(order__date__in=days).order_by().values(
+        'order__date', 'service_id', 'order__car__car_model__make', 'order__status',
+    ).annotate(revenue=Sum('line_total'), quantity=Sum('quantity'), entry_count=Count('pk'))
+    return [
+        RevenueRollup(
+            day=row['order__date'], service_id=row['service_id'],
+            make=row['order__car__car_model__make'] or '', status=row['order__status'],
+            revenue=row['revenue'], quantity=row['quantity'], entry_count=row['entry_count'],
+        )
+        for row in rows
+    ]
+
+
+def refresh(days):
+    with transaction.atomic():
+        RevenueRollup.objects.filter(day__in=days).delete()
+        RevenueRollup.objects.bulk_create(compute(days))
+
+
+def update(batch_size=31):
+    # days marked again while a batch is computed keep their newer mark
+    started = timezone.now()
+    days = list(StaleRollupDay.objects.filter(
+        marked_at__lte=started).order_by('day').values_list('day', flat=True))
+    for start in range(0, len(days), batch_size):
+        batch = days[start:start + batch_size]
+        with transaction.atomic():
+            refresh(batch)
+            StaleRollupDay.objects.filter(day__in=batch, marked_at__lte=started).delete()
+    return len(days)
+
+
+def rebuild(batch_size=31):
+    # days that only have rollups left (their orders are gone) are emptied as well
+    mark_days(RevenueRollup.objects.order_by().values_list('day', flat=True).distinct())
+    mark_all()
+    return update(batch_size)
+
+
+REPORT_GROUPS = {'day': 'day', 'service': 'service__name', 'make': 'make', 'status': 'status'}
+# only done orders have earned their revenue, open and cancelled ones are reported on request
+REPORT_STATUSES = (3,)
+
+
+def report(group, date_from=None, date_to=None, statuses=REPORT_STATUSES):
+    rollups = RevenueRollup.objects.filter(status__in=statuses)
+    if date_from:
+        rollups = rollups.filter(day__gte=date_from)
+    if date_to:
+        rollups = rollups.filter(day__lte=date_to)
+    field = REPORT_GROUPS[group]
+    rows = rollups.values(field).annotate(
+        revenue=Sum('revenue'), quantity=Sum('quantity'), entry_count=Sum('entry_count'),
+    ).order_by(field if group == 'day' else '-revenue')
+    statuses = dict(Order.STATUS_CHOICES)
+    for row in rows:
+        value = row.pop(field)
+        row['label'] = statuses.get(value, value) if group == 'status' else value
+        yield row
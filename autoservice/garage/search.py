@@ -0,0 +1,235 @@
+import re
+import sqlite3
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from . models import Car, CarModel, Order, normalize_identifier
+
+# SQLite FTS5 index over cars: one row per car, rowid = car id.
+# Orders are searched through their car, so order search is a join on rowid.
+
+TABLE = 'garage_search'
+COLUMNS = ('plate_nr', 'vin', 'client', 'make', 'model')
+WORD_RE = re.compile(r'\w+')
+# plates and VINs: letters and digits with at least one digit, VINs are 17 long
+IDENTIFIER_RE = re.compile(r'(?=.*\d)[A-Z0-9]{3,17}')
+
+
+_fts5_available = None
+
+
+def is_enabled():
+    """SQLite built with FTS5, elsewhere searches fall back to icontains filters."""
+    global _fts5_available
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts5_available is None:
+        # Django's SQLite backend uses the same library; a private in-memory
+        # connection keeps this safe to call from async views
+        probe = sqlite3.connect(':memory:')
+        try:
+            _fts5_available = any(option == 'ENABLE_FTS5' for option, in probe.execute('PRAGMA compile_options'))
+        finally:
+            probe.close()
+    return _fts5_available
+
+
+def create_table(cursor):
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        f"{', '.join(COLUMNS)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+
+
+def drop_table(cursor):
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def _select_cars(where):
+    return (
+        f"SELECT c.id, c.plate_nr, c.vin, "
+        f"COALESCE(u.first_name, '') || ' ' || COALESCE(u.last_name, ''), "
+        f"COALESCE(m.make, ''), COALESCE(m.model, '') "
+        f"FROM {Car._meta.db_table} c "
+        f"LEFT JOIN {get_user_model()._meta.db_table} u ON u.id = c.client_id "
+        f"LEFT JOIN {CarModel._meta.db_table} m ON m.id = c.car_model_id "
+        f"WHERE {where}"
+    )
+
+
+def _reindex(where, params):
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {TABLE} WHERE rowid IN (SELECT c.id FROM {Car._meta.db_table} c WHERE {where})",
+            params,
+        )
+        cursor.execute(
+            f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) {_select_cars(where)}",
+            params,
+        )
+
+
+def index_cars(car_ids):
+    car_ids = list(car_ids)
+    if car_ids:
+        _reindex(f"c.id IN ({', '.join(['%s'] * len(car_ids))})", car_ids)
+
+
+def index_car_model(car_model_id):
+    _reindex("c.car_model_id = %s", [car_model_id])
+
+
+def index_client(client_id):
+    _reindex("c.client_id = %s", [client_id])
+
+
+def remove_car(car_id):
+    if is_enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [car_id])
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        create_table(cursor)
+        cursor.execute(f"DELETE FROM {TABLE}")
+        cursor.execute(f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) {_select_cars('1 = 1')}")
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE}")
+        return cursor.fetchone()[0]
+
+
+def match_expression(query, columns=None):
+    # every word becomes a quoted prefix term, terms are ANDed
+    terms = ' '.join(f'"{word}"*' for word in WORD_RE.findall(query))
+    if not terms:
+        return None
+    if columns:
+        return f"{{{' '.join(columns)}}} : ({terms})"
+    return terms
+
+
+class RankedResults:
+    """Lazy, paginator friendly list of objects in FTS rank order."""
+
+    def __init__(self, queryset, id_sql, params):
+        self.queryset = queryset
+        self.model = queryset.model
+        self.id_sql = id_sql
+        self.params = list(params)
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM ({self.id_sql})", self.params)
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        limit = -1 if key.stop is None else max(key.stop - start, 0)
+        with connection.cursor() as cursor:
+            cursor.execute(f"{self.id_sql} LIMIT %s OFFSET %s", self.params + [limit, start])
+            ids = [row[0] for row in cursor.fetchall()]
+        objects = self.queryset.in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
+
+
+def search_orders(queryset, query):
+    expression = match_expression(query)
+    if expression is None:
+        return queryset.none()
+    id_sql = (
+        f"SELECT o.id FROM {TABLE} s JOIN {Order._meta.db_table} o ON o.car_id = s.rowid "
+        f"WHERE {TABLE} MATCH %s ORDER BY s.rank, o.date, o.id"
+    )
+    return RankedResults(queryset, id_sql, [expression])
+
+
+def search_cars(queryset, query, columns=None):
+    expression = match_expression(query, columns)
+    if expression is None:
+        return queryset.none()
+    id_sql = f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s ORDER BY rank, rowid"
+    return RankedResults(queryset, id_sql, [expression])
+
+
+def identifier_lookups(query):
+    """
+    Car querysets for a plate or VIN shaped query, to be tried in order:
+    exact match first, then prefix match. Both are range scans of the
+    plate_key/vin_key indexes. Other queries get no lookups.
+    """
+    key = normalize_identifier(query)
+    if not IDENTIFIER_RE.fullmatch(key):
+        return []
+    # the smallest string after every string starting with key
+    upper = key[:-1] + chr(ord(key[-1]) + 1)
+    return [
+        Car.objects.filter(Q(plate_key=key) | Q(vin_key=key)),
+        Car.objects.filter(
+            Q(plate_key__gte=key, plate_key__lt=upper) | Q(vin_key__gte=key, vin_key__lt=upper)),
+    ]
+
+
+def identifier_cars(query):
+    """The first non empty identifier lookup, None to fall back to text search."""
+    for cars in identifier_lookups(query):
+        if cars.exists():
+            return cars
+    return None
+
+
+async def aidentifier_cars(query):
+    for cars in identifier_lookups(query):
+        if await cars.aexists():
+            return cars
+    return None
+
+
+# Query building shared by garage.views and garage.async_views
+
+
+def model_cars(queryset, query):
+    """Cars whose make or model matches the query, in rank order with full-text search."""
+    if not query:
+        return queryset
+    if is_enabled():
+        return search_cars(queryset, query, columns=('make', 'model'))
+    return queryset.filter(Q(car_model__make__icontains=query) | Q(car_model__model__icontains=query))
+
+
+def _matching_orders(queryset, query, cars):
+    if cars is not None:
+        return queryset.filter(car__in=cars)
+    if is_enabled():
+        return search_orders(queryset, query)
+    return queryset.filter(
+        Q(car__plate_nr__icontains=query) |
+        Q(car__vin__icontains=query) |
+        Q(car__client__first_name__icontains=query) |
+        Q(car__client__last_name__icontains=query) |
+        Q(car__car_model__make__icontains=query) |
+        Q(car__car_model__model__icontains=query)
+    )
+
+
+def matching_orders(queryset, query):
+    """Orders of the cars a plate/VIN query names, otherwise full-text or substring matches."""
+    if not query:
+        return queryset
+    return _matching_orders(queryset, query, identifier_cars(query))
+
+
+async def amatching_orders(queryset, query):
+    if not query:
+        return queryset
+    return _matching_orders(queryset, query, await aidentifier_cars(query))
@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from . import autocomplete, counters, covers, rollups, search
+from . models import Car, CarModel, Order, OrderEntry, Service
+
+User = get_user_model()
+
+# Keep the stored Order.total and Order.entry_count in sync for the touched orders only
+
+
+@receiver(pre_save, sender=OrderEntry)
+def remember_entry_order(sender, instance, **kwargs):
+    instance._previous_order_id = None
+    if instance.pk:
+        instance._previous_order_id = OrderEntry.objects.filter(
+            pk=instance.pk).values_list('order_id', flat=True).first()
+
+
+@receiver(post_save, sender=OrderEntry)
+def entry_saved(sender, instance, **kwargs):
+    order_ids = {instance.order_id, getattr(instance, '_previous_order_id', None)}
+    order_ids.discard(None)
+    Order.objects.filter(pk__in=order_ids).refresh_totals()
+    rollups.mark_orders(Order.objects.filter(pk__in=order_ids))
+
+
+@receiver(post_delete, sender=OrderEntry)
+def entry_deleted(sender, instance, **kwargs):
+    Order.objects.filter(pk=instance.order_id).refresh_totals()
+    rollups.mark_orders(Order.objects.filter(pk=instance.order_id))
+
+# Keep the full-text search index current and the cover renditions fresh
+
+
+@receiver(pre_save, sender=Car)
+def remember_car_cover(sender, instance, **kwargs):
+    instance._previous_cover = instance._previous_car_model_id = instance._previous_client_id = None
+    if instance.pk:
+        (instance._previous_cover, instance._previous_car_model_id,
+         instance._previous_client_id) = Car.objects.filter(
+            pk=instance.pk).values_list('cover', 'car_model_id', 'client_id').first() or (None, None, None)
+
+
+@receiver(post_save, sender=Car)
+def car_saved(sender, instance, created, **kwargs):
+    search.index_cars([instance.pk])
+    if not created and (getattr(instance, '_previous_cover', None) or '') != (instance.cover.name or ''):
+        covers.purge(instance.pk)
+    if not created and getattr(instance, '_previous_car_model_id', None) != instance.car_model_id:
+        rollups.mark_orders(instance.orders.all())
+    # Order.client is a copy of the car's client
+    if not created and getattr(instance, '_previous_client_id', None) != instance.client_id:
+        instance.orders.update(client_id=instance.client_id)
+
+
+@receiver(post_delete, sender=Car)
+def car_deleted(sender, instance, **kwargs):
+    search.remove_car(instance.pk)
+    covers.purge(instance.pk)
+
+
+@receiver(post_save, sender=CarModel)
+def car_model_saved(sender, instance, created, **kwargs):
+    # rebuilt after the commit, so another request cannot load the old catalog again
+    transaction.on_commit(autocomplete.invalidate)
+    if not created:
+        search.index_car_model(instance.pk)
+        rollups.mark_orders(Order.objects.filter(car__car_model=instance))
+
+
+@receiver(pre_delete, sender=CarModel)
+def remember_car_model_cars(sender, instance, **kwargs):
+    instance._car_ids = list(instance.cars.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=CarModel)
+def car_model_deleted(sender, instance, **kwargs):
+    transaction.on_commit(autocomplete.invalidate)
+    search.index_cars(getattr(instance, '_car_ids', []))
+    rollups.mark_orders(Order.objects.filter(car_id__in=getattr(instance, '_car_ids', [])))
+
+
+@receiver(post_save, sender=User)
+def client_saved(sender, instance, created, update_fields=None, **kwargs):
+    # logins only touch last_login, names are unchanged
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    search.index_client(instance.pk)
+
+# Drop the cached landing page counters when one of them changes,
+# orders also mark their revenue rollup days stale
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=Car)
+def counted_object_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.invalidate()
+
+
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=Car)
+def counted_object_deleted(sender, instance, **kwargs):
+    counters.invalidate()
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    instance._previous_status = instance._previous_date = None
+    if instance.pk:
+        instance._previous_status, instance._previous_date = Order.objects.filter(
+            pk=instance.pk).values_list('status', 'date').first() or (None, None)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    previous_status = getattr(instance, '_previous_status', None)
+    if (instance.status == 3) != (previous_status == 3):
+        counters.invalidate()
+    # a new order has no entries yet, its day is marked by the first one
+    previous_date = getattr(instance, '_previous_date', None)
+    if not created and (previous_status != instance.status or previous_date != instance.date):
+        rollups.mark_days([previous_date, instance.date])
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    if instance.status == 3:
+        counters.invalidate()
+    rollups.mark_days([instance.date])
@@ -0,0 +1,68 @@
+// Suggestions from the car model autocomplete endpoint (data-autocomplete="url"):
+// a text input fills its datalist with make and model, a select gets a filter
+// box that loads the matching car models as its options.
+(function () {
+    const DELAY = 150;
+
+    function fetchSuggestions(url, query, limit) {
+        const params = new URLSearchParams({q: query, limit: limit});
+        return fetch(url + '?' + params, {headers: {Accept: 'application/json'}})
+            .then(response => response.ok ? response.json() : {results: []})
+            .then(data => data.results);
+    }
+
+    function onQuery(input, url, limit, callback) {
+        let timer = null;
+        let latest = 0;
+        input.addEventListener('input', () => {
+            clearTimeout(timer);
+            timer = setTimeout(() => {
+                const query = input.value.trim();
+                const request = ++latest;
+                const results = query ? fetchSuggestions(url, query, limit) : Promise.resolve(null);
+                // answers of older queries may arrive after newer ones
+                results.then(items => request === latest && callback(items)).catch(() => {});
+            }, DELAY);
+        });
+    }
+
+    function setupInput(input) {
+        const datalist = document.getElementById(input.getAttribute('list'));
+        if (!datalist) {
+            return;
+        }
+        onQuery(input, input.dataset.autocomplete, 10, items => {
+            const labels = new Set((items || []).map(item => item.make + ' ' + item.model));
+            datalist.replaceChildren(...[...labels].map(label => new Option(label)));
+        });
+    }
+
+    function setupSelect(select) {
+        // the page only renders the empty and the selected option, matches are added here
+        const filter = document.createElement('input');
+        filter.type = 'text';
+        filter.autocomplete = 'off';
+        filter.placeholder = 'Type make or model';
+        select.before(filter);
+        onQuery(filter, select.dataset.autocomplete, 20, items => {
+            const selected = select.value;
+            const kept = [...select.options].filter(option => !option.value || option.value === selected);
+            const found = (items || [])
+                .filter(item => String(item.id) !== selected)
+                .map(item => new Option(item.label, item.id));
+            select.replaceChildren(...kept, ...found);
+            select.value = selected || (found.length ? found[0].value : '');
+        });
+    }
+
+    function setup() {
+        document.querySelectorAll('input[data-autocomplete]').forEach(setupInput);
+        document.querySelectorAll('select[data-autocomplete]').forEach(setupSelect);
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', setup);
+    } else {
+        setup();
+    }
+})();
@@ -0,0 +1,16 @@
+from django import template
+from .. import covers
+
+register = template.Library()
+
+
+@register.inclusion_tag('garage/includes/car_cover.html')
+def car_cover(car, sizes='16vw'):
+    if not car.cover:
+        return {'car': car}
+    return {
+        'car': car,
+        'src': covers.url(car, covers.WIDTHS[0]),
+        'srcset': covers.srcset(car),
+        'sizes': sizes,
+    }
@@ -1,3 +1,563 @@
-from django.test import TestCase
+import base64
+import html
+import importlib
+import json
+import re
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from PIL import Image
+from . import async_views, autocomplete, counters, covers, notes, rollups, search
+from . import urls as garage_urls
+from . forms import CarCreateForm
+from . models import Car, CarModel, Order, OrderEntry, OrderReview, Service
+from . pagination import CursorPaginator
+from . templatetags.car_covers import car_cover
 
-# Create your tests here.
+User = get_user_model()
+
+
+class QueryPlanTests(TestCase):
+    """The hot querysets must be answered from indexes on the seeded dataset."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_garage', users=30, orders=600, seed=1, stdout=StringIO())
+        cls.client_user = User.objects.filter(orders__isnull=False).first()
+        cls.car = Car.objects.first()
+        cls.order = Order.objects.order_by('date', 'id')[Order.objects.count() // 2]
+
+    def query_plan(self, sql, params=()):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN is SQLite syntax')
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexed(self, queryset_or_sql):
+        if isinstance(queryset_or_sql, str):
+            plan = self.query_plan(queryset_or_sql)
+        else:
+            plan = self.query_plan(*queryset_or_sql.query.sql_with_params())
+        for step in plan:
+            self.assertNotIn('TEMP B-TREE', step, plan)
+            # "SCAN table" ("SCAN TABLE table" before SQLite 3.36) reads every row,
+            # "SCAN table USING INDEX" walks an index in order
+            self.assertIsNone(re.match(r'SCAN (TABLE )?\w+$', step), plan)
+
+    def cursor_querysets(self, queryset, ordering):
+        paginator = CursorPaginator(queryset, 5, ordering)
+        key = [getattr(self.order, field.lstrip('-')) for field in ordering]
+        return [
+            queryset.order_by(*ordering)[:6],
+            queryset.order_by(*ordering).filter(paginator._after(key))[:6],
+            queryset.order_by(*paginator._reversed_ordering()).filter(paginator._after(key, reverse=True))[:6],
+        ]
+
+    def test_order_list_pages(self):
+        for queryset in self.cursor_querysets(Order.objects.select_related('car'), Order._meta.ordering):
+            self.assertIndexed(queryset)
+
+    def test_user_order_pages(self):
+        orders = Order.objects.filter(client=self.client_user)
+        for queryset in self.cursor_querysets(orders, Order._meta.ordering):
+            self.assertIndexed(queryset)
+
+    def test_index_counters(self):
+        cache.delete(counters.CACHE_KEY)
+        with CaptureQueriesContext(connection) as queries:
+            counters.get_counters()
+        self.assertEqual(len(queries), 3)
+        for query in queries:
+            if 'garage_order' in query['sql']:
+                self.assertIndexed(query['sql'])
+
+    def test_client_cars(self):
+        self.assertIndexed(Car.objects.filter(client=self.client_user))
+
+    def test_plate_and_vin_lookups(self):
+        for query in (self.car.plate_nr, self.car.plate_nr[:4], self.car.vin, self.car.vin[:8]):
+            lookups = search.identifier_lookups(query)
+            self.assertEqual(len(lookups), 2)
+            for cars in lookups:
+                self.assertIndexed(cars)
+            self.assertIn(self.car, search.identifier_cars(query))
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.golf = CarModel.objects.create(make='Volkswagen', model='Golf', engine='2.0 TDI', year=2015)
+        cls.polo = CarModel.objects.create(make='Volkswagen', model='Polo', year=2010)
+        cls.focus = CarModel.objects.create(make='Ford', model='Focus', engine='1.6', year=2012)
+
+    def setUp(self):
+        autocomplete.invalidate()
+
+    def suggested_ids(self, query, limit=autocomplete.DEFAULT_LIMIT):
+        return [car_model['id'] for car_model in autocomplete.suggest(query, limit)]
+
+    def test_prefix_of_any_word(self):
+        self.assertEqual(self.suggested_ids('volks'), [self.golf.pk, self.polo.pk])
+        self.assertEqual(self.suggested_ids('  GOLF  2.0 '), [self.golf.pk])
+        self.assertEqual(self.suggested_ids('2012'), [self.focus.pk])
+        self.assertEqual(self.suggested_ids('volkswagen', limit=1), [self.golf.pk])
+        self.assertEqual(self.suggested_ids('opel'), [])
+        self.assertEqual(self.suggested_ids(' '), [])
+
+    def test_signals_invalidate_the_index(self):
+        self.assertEqual(self.suggested_ids('focus'), [self.focus.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.focus.model = 'Mondeo'
+            self.focus.save()
+        self.assertEqual(self.suggested_ids('focus'), [])
+        self.assertEqual(self.suggested_ids('mondeo'), [self.focus.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.polo.delete()
+        self.assertEqual(self.suggested_ids('polo'), [])
+
+    def test_car_model_widget_renders_the_selected_car_model_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            html = str(CarCreateForm(instance=Car(car_model=self.golf))['car_model'])
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(html.count('<option'), 2)
+        self.assertInHTML(
+            '<option value="%d" selected>Volkswagen Golf 2.0 TDI 2015</option>' % self.golf.pk, html)
+        self.assertEqual(str(CarCreateForm()['car_model']).count('<option'), 1)
+
+        data = {'plate_nr': 'ABC123', 'vin': 'VIN123'}
+        form = CarCreateForm({**data, 'car_model': self.polo.pk})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['car_model'], self.polo)
+        self.assertIn('car_model', CarCreateForm({**data, 'car_model': 0}).errors)
+
+    def test_endpoint(self):
+        response = self.client.get(reverse('car_model_autocomplete'), {'q': 'golf'})
+        self.assertEqual(response.json()['results'], [{
+            'id': self.golf.pk, 'label': 'Volkswagen Golf 2.0 TDI 2015', 'make': 'Volkswagen',
+            'model': 'Golf', 'engine': '2.0 TDI', 'year': 2015,
+        }])
+        self.assertEqual(self.client.get(reverse('car_model_autocomplete'), {'q': 'x', 'limit': 'a'}).status_code, 400)
+
+
+class RevenueReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('accountant', is_staff=True)
+        car = Car.objects.create(
+            plate_nr='ABC123', vin='VIN123', client=cls.staff,
+            car_model=CarModel.objects.create(make='Volvo', model='V70'))
+        service = Service.objects.create(name='Oil change', price=10)
+        for status, quantity in ((3, 1), (1, 2), (7, 4)):
+            order = Order.objects.create(car=car, status=status)
+            OrderEntry.objects.create(order=order, service=service, quantity=quantity)
+        rollups.update()
+
+    def revenue(self, group, **kwargs):
+        return {row['label']: row['revenue'] for row in rollups.report(group, **kwargs)}
+
+    def test_only_done_orders_by_default(self):
+        self.assertEqual(self.revenue('service'), {'Oil change': 10})
+        self.assertEqual(self.revenue('make'), {'Volvo': 10})
+        self.assertEqual(list(self.revenue('day').values()), [10])
+        self.assertEqual(self.revenue('status'), {'Done': 10})
+        self.assertEqual(self.revenue('status', statuses=(1, 3, 7)), {'Cancelled': 40, 'Working': 20, 'Done': 10})
+
+    def test_view_status_filter(self):
+        self.client.force_login(self.staff)
+        url = reverse('revenue_report')
+        self.assertEqual(self.client.get(url).context['revenue'], 10)
+        self.assertEqual(self.client.get(url, {'status': [1, 3]}).context['revenue'], 30)
+        self.assertEqual(self.client.get(url, {'status': 5}).status_code, 400)
+
+
+
+class NotesSanitizerTests(SimpleTestCase):
+    # Car.notes_html is output with |safe, everything below must come out inert
+
+    def assertSanitized(self, html, expected):
+        self.assertEqual(notes.render(html)[0], expected)
+
+    def test_script_and_style_are_dropped_with_their_content(self):
+        self.assertSanitized('<script>alert(1)</script>ok', 'ok')
+        self.assertSanitized('<SCRIPT src="https://evil.example/x.js"></SCRIPT>ok', 'ok')
+        self.assertSanitized('<style>p { display: none }</style>ok', 'ok')
+        self.assertSanitized('<iframe src="https://evil.example"><p>x</p></iframe>ok', 'ok')
+        self.assertSanitized('<iframe src="https://evil.example"/>kept <b>text</b>', 'kept <b>text</b>')
+        self.assertSanitized('<div><svg onload="alert(1)">t</svg></div>', 't')
+        self.assertSanitized('<!-- <script>alert(1)</script> -->ok', 'ok')
+
+    def test_event_handler_attributes_are_dropped(self):
+        self.assertSanitized('<p onclick="alert(1)" ONMOUSEOVER=alert(1)>a</p>', '<p>a</p>')
+        self.assertSanitized('<img src="/a.png" onerror="alert(1)">', '<img src="/a.png">')
+        self.assertSanitized(
+            '<a title=\'"><script>alert(1)</script>\'>t</a>',
+            '<a title="&quot;&gt;&lt;script&gt;alert(1)&lt;/script&gt;">t</a>')
+
+    def test_unsafe_urls_are_dropped(self):
+        for url in (
+            'javascript:alert(1)', 'JaVaScRiPt:alert(1)', ' javascript:alert(1)',
+            '&#106;avascript:alert(1)', '&#x6A;avascript&colon;alert(1)', 'java&#x09;script:alert(1)',
+            'data:text/html;base64,PHNjcmlwdD4=', 'DATA:text/html,x', 'vbscript:msgbox(1)',
+        ):
+            with self.subTest(url=url):
+                self.assertSanitized(f'<a href="{url}">x</a>', '<a>x</a>')
+                self.assertSanitized(f'<img src="{url}">', '<img>')
+        self.assertSanitized(
+            '<a href="https://example.com/?a=1&amp;b=2">x</a>',
+            '<a href="https://example.com/?a=1&amp;b=2" rel="nofollow noopener">x</a>')
+        self.assertSanitized('<a href="/car/1/">x</a>', '<a href="/car/1/" rel="nofollow noopener">x</a>')
+        self.assertSanitized(
+            '<p style="color: red; position: fixed; background: url(javascript:x)">s</p>',
+            '<p style="color: red">s</p>')
+
+    def test_unbalanced_and_nested_tags(self):
+        self.assertSanitized('<b><i>x</b>y', '<b><i>x</i></b>y')
+        self.assertSanitized('</p>stray</b>', 'stray')
+        self.assertSanitized('<p>unclosed <em>tags', '<p>unclosed <em>tags</em></p>')
+        self.assertSanitized('<ul><li>a<li>b</ul>', '<ul><li>a</li><li>b</li></ul>')
+        self.assertSanitized(
+            '<table><tr><td>1<td>2<tr><td>3</table>',
+            '<table><tr><td>1</td><td>2</td></tr><tr><td>3</td></tr></table>')
+        self.assertSanitized('<script><script>x</script>y</script>z', 'yz')
+        self.assertSanitized('&lt;script&gt;', '&lt;script&gt;')
+
+    def test_excerpt(self):
+        self.assertEqual(notes.render('<p>Brake <b>pads</b></p><p>worn</p><script>x</script>')[1], 'Brake pads worn')
+        excerpt = notes.render('<p>%s</p>' % ('word ' * 100))[1]
+        self.assertEqual(len(excerpt), notes.EXCERPT_LENGTH)
+        self.assertTrue(excerpt.endswith('…'))
+        self.assertEqual(notes.render(''), ('', ''))
+
+
+class NotesBackfillTests(TestCase):
+    def test_migration_renders_cars_saved_before_notes_html(self):
+        backfill = importlib.import_module('garage.migrations.0024_backfill_car_notes_html')
+        car_model = CarModel.objects.create(make='Volkswagen', model='Golf')
+        saved = Car.objects.create(plate_nr='ABC 123', vin='VIN1', car_model=car_model,
+                                   notes='<p onclick="x">Brake <b>pads</b></p><script>x</script>')
+        Car.objects.create(plate_nr='ABC 124', vin='VIN2', car_model=car_model)
+        # as left by migration 0020 for the cars saved before it
+        Car.objects.update(notes_html='', notes_excerpt='')
+        backfill.render_car_notes(django_apps, connection.schema_editor())
+        saved.refresh_from_db()
+        self.assertEqual((saved.notes_html, saved.notes_excerpt), notes.render(saved.notes))
+        self.assertEqual(saved.notes_html, '<p>Brake <b>pads</b></p>')
+        self.assertEqual(Car.objects.filter(notes_html='').count(), 1)
+
+
+class SearchFallbackTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        client = User.objects.create_user('driver', first_name='Jonas', last_name='Petrauskas')
+        cls.car = Car.objects.create(
+            plate_nr='ABC 123', vin='WVWZZZ1KZ6W000001', client=client,
+            car_model=CarModel.objects.create(make='Volkswagen', model='Golf'))
+        cls.order = Order.objects.create(car=cls.car)
+
+    def test_sqlite_without_fts5(self):
+        with mock.patch.object(search, '_fts5_available', False), connection.cursor() as cursor:
+            # as on a build where migration 0018 could not create it
+            search.drop_table(cursor)
+            self.assertFalse(search.is_enabled())
+            for query in ('jonas', 'golf', 'abc 1'):
+                orders = search.matching_orders(Order.objects.all(), query)
+                self.assertIsInstance(orders, QuerySet)
+                self.assertEqual(list(orders), [self.order])
+            self.assertEqual(list(search.model_cars(Car.objects.all(), 'volks')), [self.car])
+            response = self.client.get(reverse('order_list'), {'query': 'petrausk'})
+            self.assertEqual(list(response.context['order_list']), [self.order])
+            self.car.plate_nr = 'XYZ 999'
+            self.car.save()
+            self.car.delete()
+
+
+class CarCoverTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root))
+        buffer = BytesIO()
+        Image.new('RGB', (500, 300), 'green').save(buffer, 'JPEG')
+        self.car = Car.objects.create(
+            plate_nr='ABC123', vin='VIN123', cover=SimpleUploadedFile('cover.jpg', buffer.getvalue()))
+
+    def test_srcset_lists_real_widths_without_storage_lookups(self):
+        cover_url = reverse('car_cover', kwargs={'pk': self.car.pk, 'width': 320})
+        self.assertEqual(car_cover(self.car), {'car': self.car, 'src': cover_url, 'srcset': '', 'sizes': '16vw'})
+
+        self.assertEqual(self.client.get(cover_url).status_code, 302)
+        self.car.refresh_from_db()
+        self.assertEqual(covers.built_widths(self.car), {320: 320, 640: 500, 1024: 500})
+        with mock.patch.object(covers.default_storage, 'exists', side_effect=AssertionError('storage lookup')):
+            context = car_cover(self.car)
+        self.assertEqual(context['src'], covers.default_storage.url(covers.rendition_name(self.car, 320)))
+        self.assertEqual(context['srcset'], '%s 320w, %s 500w' % (
+            context['src'], covers.default_storage.url(covers.rendition_name(self.car, 640))))
+
+        # a new cover has no renditions yet
+        self.car.cover = SimpleUploadedFile('new.jpg', self.car.cover.read())
+        self.car.save()
+        self.assertIsNone(covers.built_widths(self.car))
+
+
+class AsyncViewTests(TestCase):
+    """The read views as routed under ASGI (settings.ASYNC_VIEWS)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.driver = User.objects.create_user('driver', first_name='Jonas', last_name='Petrauskas')
+        cls.other = User.objects.create_user('other')
+        golf = CarModel.objects.create(make='Volkswagen', model='Golf')
+        cls.car = Car.objects.create(plate_nr='ABC 123', vin='WVWZZZ1KZ6W000001', client=cls.driver, car_model=golf)
+        cls.other_car = Car.objects.create(
+            plate_nr='XYZ 987', vin='VF1AAAAA000000002', client=cls.other,
+            car_model=CarModel.objects.create(make='Renault', model='Clio'))
+        service = Service.objects.create(name='Oil change', price=20)
+        cls.orders = [Order.objects.create(car=cls.car) for _ in range(3)]
+        cls.other_orders = [Order.objects.create(car=cls.other_car) for _ in range(4)]
+        OrderEntry.objects.create(order=cls.orders[0], service=service, quantity=2)
+        OrderReview.objects.create(order=cls.orders[0], reviewer=cls.driver, content='Thanks')
+
+    def route_views(self):
+        # the project URLconf keeps the included garage patterns, it is reloaded as well
+        importlib.reload(garage_urls)
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    def setUp(self):
+        # cleanups run last in first out: the views are routed back after the setting is restored
+        self.addCleanup(self.route_views)
+        self.enterContext(self.settings(ASYNC_VIEWS=True))
+        self.route_views()
+        # as in a fresh worker, where the first search probes for FTS5 from the event loop
+        self.enterContext(mock.patch.object(search, '_fts5_available', None))
+        cache.delete(counters.CACHE_KEY)
+
+    def order_ids(self, response):
+        return [order.pk for order in response.context['order_list']]
+
+    async def test_routing(self):
+        self.assertIs(resolve('/').func, async_views.index)
+        self.assertIs(resolve('/orders/').func.view_class, async_views.OrderListView)
+
+    async def test_index(self):
+        response = await self.async_client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['count_cars'], 2)
+        self.assertEqual(response.context['num_visits'], 1)
+        self.async_client.cookies['num_visits'] = response.cookies['num_visits'].value
+        response = await self.async_client.get(reverse('index'))
+        self.assertEqual(response.context['num_visits'], 2)
+
+    async def test_car_model_list(self):
+        response = await self.async_client.get(reverse('car_model_list'))
+        self.assertEqual([car.pk for car in response.context['car_model_list']], [self.car.pk, self.other_car.pk])
+        for query in ('golf', 'volks'):
+            response = await self.async_client.get(reverse('car_model_list'), {'query': query})
+            self.assertEqual([car.pk for car in response.context['car_model_list']], [self.car.pk])
+
+    async def test_order_list(self):
+        response = await self.async_client.get(reverse('order_list'))
+        self.assertEqual(self.order_ids(response), [order.pk for order in (self.orders + self.other_orders)[:5]])
+        self.assertTrue(response.context['page_obj'].has_next())
+        for query in ('golf', 'abc-123', 'petrauskas'):
+            with self.subTest(query=query):
+                response = await self.async_client.get(reverse('order_list'), {'query': query})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.order_ids(response), [order.pk for order in self.orders])
+        response = await self.async_client.get(reverse('order_list'), {'query': 'nothing'})
+        self.assertEqual(self.order_ids(response), [])
+
+    async def test_order_detail(self):
+        order = self.orders[0]
+        response = await self.async_client.get(reverse('order_detail', kwargs={'pk': order.pk}))
+        self.assertEqual(response.context['order'], order)
+        self.assertEqual(len(response.context['entries']), 1)
+        self.assertEqual([review.content for review in response.context['reviews']], ['Thanks'])
+        response = await self.async_client.get(reverse('order_detail', kwargs={'pk': 0}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_order_detail_post_review(self):
+        order = self.orders[1]
+        await sync_to_async(self.async_client.force_login)(self.driver)
+        url = reverse('order_detail', kwargs={'pk': order.pk})
+        response = await self.async_client.post(url, {'content': 'Ready?', 'order': order.pk, 'reviewer': self.driver.pk})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertTrue(await OrderReview.objects.filter(order=order, content='Ready?').aexists())
+
+    async def test_user_orders(self):
+        response = await self.async_client.get(reverse('user_orders'))
+        self.assertRedirects(response, '%s?next=%s' % (reverse('login'), reverse('user_orders')), fetch_redirect_response=False)
+        await sync_to_async(self.async_client.force_login)(self.other)
+        response = await self.async_client.get(reverse('user_orders'))
+        self.assertEqual(self.order_ids(response), [order.pk for order in self.other_orders])
+
+
+class OrderEntryPriceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.clutch = Service.objects.create(name='Clutch', price=Decimal('231.54'))
+        cls.oil_change = Service.objects.create(name='Oil change', price=Decimal('187.92'))
+        cls.order = Order.objects.create(car=Car.objects.create(plate_nr='ABC123', vin='VIN123'))
+
+    def test_catalog_price_is_kept(self):
+        entry = OrderEntry.objects.create(order=self.order, service=self.clutch, quantity=2)
+        Service.objects.filter(pk=self.clutch.pk).update(price=300)
+        entry = OrderEntry.objects.get(pk=entry.pk)
+        entry.quantity = 1
+        entry.save()
+        self.assertEqual(entry.unit_price, Decimal('231.54'))
+
+    def test_service_change_takes_the_new_price(self):
+        entry = OrderEntry.objects.create(order=self.order, service=self.clutch, quantity=2)
+        entry = OrderEntry.objects.get(pk=entry.pk)
+        entry.service = self.oil_change
+        entry.save()
+        entry.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual((entry.unit_price, entry.line_total), (Decimal('187.92'), Decimal('375.84')))
+        self.assertEqual(self.order.total, Decimal('375.84'))
+
+    def test_service_change_with_a_given_price(self):
+        entry = OrderEntry.objects.create(order=self.order, service=self.clutch, quantity=1)
+        entry.service = self.oil_change
+        entry.unit_price = Decimal('150.00')
+        entry.save()
+        self.assertEqual(OrderEntry.objects.get(pk=entry.pk).unit_price, Decimal('150.00'))
+
+
+class OrderTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        car = Car.objects.create(plate_nr='ABC123', vin='VIN123')
+        cls.oil_change = Service.objects.create(name='Oil change', price=Decimal('20.00'))
+        cls.wipers = Service.objects.create(name='Wipers', price=Decimal('15.50'))
+        cls.first, cls.second = Order.objects.create(car=car), Order.objects.create(car=car)
+
+    def assertTotals(self, order, total, entry_count):
+        order.refresh_from_db()
+        self.assertEqual((order.total, order.entry_count), (Decimal(total), entry_count))
+
+    def sync_order_totals(self, *args):
+        stdout = StringIO()
+        call_command('sync_order_totals', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_entry_changes_update_both_orders(self):
+        entry = OrderEntry.objects.create(order=self.first, service=self.oil_change, quantity=2)
+        OrderEntry.objects.create(order=self.first, service=self.wipers, quantity=1)
+        self.assertTotals(self.first, '55.50', 2)
+        entry.quantity = 3
+        entry.save()
+        self.assertTotals(self.first, '75.50', 2)
+        entry.order = self.second
+        entry.save()
+        self.assertTotals(self.first, '15.50', 1)
+        self.assertTotals(self.second, '60.00', 1)
+        entry.delete()
+        self.assertTotals(self.second, '0', 0)
+
+    def test_cascade_deletes(self):
+        OrderEntry.objects.create(order=self.first, service=self.oil_change, quantity=1)
+        OrderEntry.objects.create(order=self.first, service=self.wipers, quantity=2)
+        OrderEntry.objects.create(order=self.second, service=self.wipers, quantity=1)
+        self.wipers.delete()
+        self.assertTotals(self.first, '20.00', 1)
+        self.assertTotals(self.second, '0', 0)
+        self.first.delete()
+        self.assertFalse(OrderEntry.objects.exists())
+
+    def test_verify_and_backfill(self):
+        OrderEntry.objects.create(order=self.first, service=self.oil_change, quantity=1)
+        self.assertIn('2 orders checked, 0 out of date', self.sync_order_totals('--verify'))
+        # drift as left by a raw SQL write
+        Order.objects.filter(pk=self.first.pk).update(total=Decimal('99.00'), entry_count=5)
+        with self.assertRaisesMessage(CommandError, '2 orders checked, 1 out of date'):
+            self.sync_order_totals('--verify')
+        self.assertIn('2 order totals refreshed', self.sync_order_totals('--batch-size', '1'))
+        self.assertTotals(self.first, '20.00', 1)
+        self.assertIn('0 out of date', self.sync_order_totals('--verify'))
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        car = Car.objects.create(
+            plate_nr='ABC 123', vin='WVWZZZ1KZ6W000001',
+            car_model=CarModel.objects.create(make='Volkswagen', model='Golf'))
+        for index in range(13):
+            order = Order.objects.create(car=car)
+            # pairs of orders share a day, the id orders them
+            Order.objects.filter(pk=order.pk).update(date=date(2023, 1, 1) + timedelta(days=(13 - index) // 2))
+        cls.ids = list(Order.objects.order_by('date', 'id').values_list('pk', flat=True))
+
+    def paginator(self):
+        return CursorPaginator(Order.objects.all(), 5, ('date', 'id'))
+
+    def page_ids(self, page):
+        return [order.pk for order in page]
+
+    def test_next_previous_and_last_round_trip(self):
+        paginator = self.paginator()
+        page = paginator.get_page(None)
+        self.assertFalse(page.has_previous())
+        seen = self.page_ids(page)
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            seen += self.page_ids(page)
+        self.assertEqual(seen, self.ids)
+
+        page = paginator.get_page(page.last_cursor)
+        self.assertEqual(self.page_ids(page), self.ids[-5:])
+        self.assertFalse(page.has_next())
+        seen = self.page_ids(page)
+        while page.has_previous():
+            page = paginator.get_page(page.previous_cursor)
+            seen = self.page_ids(page) + seen
+        self.assertEqual(seen, self.ids)
+
+    def test_bad_cursor_falls_back_to_the_first_page(self):
+        paginator = self.paginator()
+        encode = lambda value: base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+        for cursor in (
+            'garbage', '!!!', encode(['x', None]), encode(['n', ['2023-01-02']]),
+            encode(['n', ['not a date', '1']]), encode(['n', ['2023-01-02', 'one']]), encode({'n': 1}),
+        ):
+            with self.subTest(cursor=cursor):
+                page = paginator.get_page(cursor)
+                self.assertEqual(self.page_ids(page), self.ids[:5])
+                self.assertFalse(page.has_previous())
+
+    def assertLinksKeepQuery(self, response, query):
+        links = re.findall(r'href="\?([^"]+)"', response.content.decode())
+        self.assertTrue(links)
+        for link in links:
+            self.assertEqual(parse_qs(html.unescape(link))['query'], [query], link)
+
+    def test_links_keep_the_query(self):
+        # a plate is paginated by cursor, a text search by page number
+        for query in ('abc-123', 'golf & volks'):
+            with self.subTest(query=query):
+                response = self.client.get(reverse('order_list'), {'query': query})
+                self.assertEqual(len(response.context['order_list']), 5)
+                self.assertLinksKeepQuery(response, query)
+                next_link = re.search(r'href="\?([^"]+)">&#9193;', response.content.decode()).group(1)
+                response = self.client.get(reverse('order_list') + '?' + html.unescape(next_link))
+                self.assertEqual([order.pk for order in response.context['order_list']][:1], self.ids[5:6])
@@ -1,14 +1,22 @@
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# the read-heavy views have async versions for ASGI deployments
+read_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('car_models/', views.car_model_list, name='car_model_list'),
-    path('car/<int:pk>/', views.car_detail, name='car_detail'),
-    path('orders/', views.OrderListView.as_view(), name='order_list'),
-    path('order/<int:pk>/', views.OderDetailView.as_view(), name='order_detail'),
-    path('orders/my/', views.UserOrderListView.as_view(), name='user_orders'),
+    path('', read_views.index, name='index'),
+    path('car_models/', read_views.car_model_list, name='car_model_list'),
+    path('car_models/autocomplete/', views.car_model_autocomplete, name='car_model_autocomplete'),
+    path('car/<int:pk>/', read_views.car_detail, name='car_detail'),
+    path('car/<int:pk>/cover/<int:width>/', views.car_cover, name='car_cover'),
+    path('orders/', read_views.OrderListView.as_view(), name='order_list'),
+    path('orders/export/', views.order_export, name='order_export'),
+    path('reports/revenue/', views.revenue_report, name='revenue_report'),
+    path('order/<int:pk>/', read_views.OderDetailView.as_view(), name='order_detail'),
+    path('orders/my/', read_views.UserOrderListView.as_view(), name='user_orders'),
     path('order/create', views.OrderCreateView.as_view(), name='order_create'),
     path('cars/my/', views.UserCarListView.as_view(), name='user_car_list'),
     path('car/create/', views.CarCreateView.as_view(), name='user_car_create'),
@@ -1,72 +1,133 @@
 from typing import Any, Dict, Optional, Type
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
+from django.conf import settings
+from django.core import signing
 from django.core.paginator import Paginator
 from datetime import date, timedelta
 from django.db.models.query import QuerySet
-from django.db.models import Q
+from django.db.models import Prefetch
 from django.forms.models import BaseModelForm
-from django.http import HttpResponse
-from django.shortcuts import render, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render, get_object_or_404
 from django.urls import reverse, reverse_lazy
+from django.utils.dateparse import parse_date
 from django.utils.translation import gettext_lazy as _
 from django.views import generic
+from autoservice.sqlite import immediate_atomic
+from . import autocomplete, counters, covers, exports, rollups, search
+from . pagination import CursorPaginationMixin, CursorPaginator
 from . forms import OrderReviewForm, OrderForm, CarCreateForm
-from . models import Car, CarModel, Service, Order, OrderEntry
+from . models import Car, Order, OrderEntry, OrderReview
 
 
-def index(request):
-    service_count = Service.objects.all().count()
-    count_orders = Order.objects.filter(status__exact=3).count()
-    count_cars = Car.objects.all().count()
+def get_num_visits(request):
+    # the counter lives in a signed cookie, so a landing page hit does not write the session row
+    try:
+        return int(request.get_signed_cookie('num_visits', salt='garage.index'))
+    except (KeyError, ValueError, signing.BadSignature):
+        return request.session.get('num_visits', 1)
 
-    num_visits = request.session.get('num_visits', 1)
-    request.session['num_visits'] = num_visits + 1 
 
-    context = {
-        'service_count' : service_count,
-        'count_orders' : count_orders,
-        'count_cars' : count_cars,
-        'num_visits': num_visits,
-    }
+def render_index(request, counters):
+    num_visits = get_num_visits(request)
+    response = render(request, 'garage/index.html', {**counters, 'num_visits': num_visits})
+    response.set_signed_cookie(
+        'num_visits', num_visits + 1, salt='garage.index',
+        max_age=settings.SESSION_COOKIE_AGE, httponly=True, samesite='Lax')
+    return response
 
-    return render(request, 'garage/index.html', context)
+def index(request):
+    return render_index(request, counters.get_counters())
 
 def car_model_list(request):
-    qs = Car.objects
-    query = request.GET.get('query')
-    if query:
-        qs = qs.filter(
-            Q(car_model__make__icontains=query) |
-            Q(car_model__model__icontains=query)
-        )
+    qs = search.model_cars(Car.objects.select_related('car_model'), request.GET.get('query'))
+    if isinstance(qs, QuerySet):
+        car_model_list = CursorPaginator(qs, 5, ('id',)).get_page(request.GET.get('cursor'))
     else:
-        qs = qs.all()
-    paginator = Paginator(qs, 5)
-    car_model_list = paginator.get_page(request.GET.get('page'))
+        car_model_list = Paginator(qs, 5).get_page(request.GET.get('page'))
     return render(request, 'garage/car_models.html', {'car_model_list' : car_model_list})
 
 def car_detail(request, pk: int):
     return render(request, 'garage/car_detail.html', {'car' : get_object_or_404(Car, pk=pk)})
 
-class OrderListView(generic.ListView):
+def car_model_autocomplete(request):
+    try:
+        limit = int(request.GET.get('limit', autocomplete.DEFAULT_LIMIT))
+    except ValueError:
+        return HttpResponseBadRequest('limit must be a number')
+    limit = max(1, min(limit, autocomplete.MAX_LIMIT))
+    return JsonResponse({'results': autocomplete.suggest(request.GET.get('q', ''), limit)})
+
+
+def car_cover(request, pk: int, width: int):
+    car = get_object_or_404(Car.objects.only('pk', 'cover', 'cover_renditions'), pk=pk)
+    if width not in covers.WIDTHS or not car.cover:
+        raise Http404
+    if covers.built_widths(car) is None:
+        covers.build(car)
+    return redirect(covers.url(car, width))
+
+@staff_member_required
+def order_export(request):
+    try:
+        filters = exports.parse_filters(
+            request.GET.get('date_from'), request.GET.get('date_to'), request.GET.getlist('status'))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    rows = exports.order_rows(exports.export_queryset(filters))
+    if request.GET.get('format') == 'jsonl':
+        response = StreamingHttpResponse(exports.jsonl_lines(rows), content_type='application/x-ndjson')
+        file_name = 'orders.jsonl'
+    else:
+        response = StreamingHttpResponse(exports.csv_lines(rows), content_type='text/csv')
+        file_name = 'orders.csv'
+    response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+    return response
+
+@staff_member_required
+def revenue_report(request):
+    group = request.GET.get('group', 'service')
+    if group not in rollups.REPORT_GROUPS:
+        return HttpResponseBadRequest('group must be one of %s' % ', '.join(rollups.REPORT_GROUPS))
+    today = date.today()
+    try:
+        date_from = parse_date(request.GET.get('date_from') or str(today - timedelta(days=30)))
+        date_to = parse_date(request.GET.get('date_to') or str(today))
+    except ValueError:
+        date_from = date_to = None
+    if date_from is None or date_to is None:
+        return HttpResponseBadRequest('dates must be given as YYYY-MM-DD')
+    status_choices = dict(Order.STATUS_CHOICES)
+    try:
+        statuses = [int(status) for status in request.GET.getlist('status')] or list(rollups.REPORT_STATUSES)
+    except ValueError:
+        statuses = None
+    if not statuses or not set(statuses) <= set(status_choices):
+        return HttpResponseBadRequest('status must be one of %s' % ', '.join(map(str, status_choices)))
+    rows = list(rollups.report(group, date_from, date_to, statuses))
+    context = {
+        'rows': rows,
+        'group': group,
+        'groups': rollups.REPORT_GROUPS,
+        'statuses': statuses,
+        'status_choices': status_choices,
+        'date_from': date_from,
+        'date_to': date_to,
+        'revenue': sum(row['revenue'] for row in rows),
+        'quantity': sum(row['quantity'] for row in rows),
+        'entry_count': sum(row['entry_count'] for row in rows),
+    }
+    return render(request, 'garage/revenue_report.html', context=context)
+
+class OrderListView(CursorPaginationMixin, generic.ListView):
     model = Order
     paginate_by = 5
     template_name = 'garage/order_list.html'
 
     def get_queryset(self) -> QuerySet[Any]:
-        qs = super().get_queryset()
-        query = self.request.GET.get('query')
-        if query:
-            qs = qs.filter(
-                 Q(car__plate_nr__icontains=query) |
-                Q(car__vin__icontains=query) |
-                Q(car__client__first_name__icontains=query) |
-                Q(car__client__last_name__icontains=query) |
-                Q(car__car_model__make__icontains=query) |
-                Q(car__car_model__model__icontains=query)
-            )
-        return qs
+        return search.matching_orders(super().get_queryset().select_related('car'), self.request.GET.get('query'))
 
 
 
@@ -74,10 +135,24 @@ class OderDetailView(generic.edit.FormMixin, generic.DetailView):
     model = Order
     template_name = 'garage/order_detail.html'
     form_class = OrderReviewForm
-    
+
+    def get_queryset(self) -> QuerySet[Any]:
+        return super().get_queryset().select_related(
+            'car__client', 'car__car_model'
+        ).prefetch_related(
+            Prefetch('entries', queryset=OrderEntry.objects.select_related('service')),
+            Prefetch('reviews', queryset=OrderReview.objects.select_related('reviewer__profile')),
+        )
+
+    def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        context['entries'] = self.object.entries.all()
+        context['reviews'] = self.object.reviews.all()
+        return context
+
     def get_initial(self) -> Dict[str, Any]:
         initial = super().get_initial()
-        initial['order'] = self.get_object()
+        initial['order'] = self.object
         initial['reviewer'] = self.request.user
         return initial 
 
@@ -90,24 +165,25 @@ class OderDetailView(generic.edit.FormMixin, generic.DetailView):
             return self.form_invalid(form)
         
     def form_valid(self, form: Any) -> HttpResponse:
-        form.instance.order = self.get_object()
+        form.instance.order = self.object
         form.instance.reviewer = self.request.user
-        form.save()
+        with immediate_atomic():
+            form.save()
         messages.success(self.request, _('Comment posted!'))
         return super().form_valid(form)
 
     def get_success_url(self) -> str:
-        return reverse('order_detail', kwargs={'pk':self.get_object().pk})
+        return reverse('order_detail', kwargs={'pk':self.object.pk})
 
 
-class UserOrderListView(LoginRequiredMixin, generic.ListView):
+class UserOrderListView(LoginRequiredMixin, CursorPaginationMixin, generic.ListView):
     model = Order
     template_name = 'garage/user_orders_list.html'
     paginate_by = 7
 
     def get_queryset(self) -> QuerySet[Any]:
         qs = super().get_queryset()
-        qs = qs.filter(car__client=self.request.user)
+        qs = qs.filter(client=self.request.user)
         return qs
     
 class OrderCreateView(LoginRequiredMixin, generic.CreateView):
@@ -126,7 +202,8 @@ class OrderCreateView(LoginRequiredMixin, generic.CreateView):
     
     def form_valid(self, form):
         form.instance.order = self.request.user
-        return super().form_valid(form)
+        with immediate_atomic():
+            return super().form_valid(form)
     
     def get_absolute_url(self):
         return reverse('order_detail', args=[str(self.id)])
@@ -196,8 +273,10 @@ class OrderDeleteView(LoginRequiredMixin, UserPassesTestMixin, generic.DeleteVie
     success_url = reverse_lazy('user_orders')
 
     def form_valid(self, form):
+        with immediate_atomic():
+            response = super().form_valid(form)
         messages.success(self.request, 'Order is deleted successfully')
-        return super().form_valid(form)
+        return response
 
     def test_func(self) -> bool | None:
         obj = self.get_object()
@@ -0,0 +1,26 @@
+from typing import Any
+from django.core.management.base import BaseCommand, CommandError
+from user_profile.models import Profile
+from user_profile.renditions import build_renditions
+
+
+class Command(BaseCommand):
+    help = 'Build picture renditions for profiles that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='rebuild every profile picture')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        profiles = Profile.objects.exclude(picture='').only('pk', 'picture', 'renditions')
+        built_count = 0
+        try:
+            for profile in profiles.iterator():
+                if options['all'] or profile.renditions.get('source') != profile.picture.name:
+                    build_renditions(profile.pk)
+                    built_count += 1
+        except Exception as e:
+            raise CommandError(e)
+        else:
+            self.stdout.write(
+                self.style.SUCCESS('%d profile pictures processed' % built_count)
+            )
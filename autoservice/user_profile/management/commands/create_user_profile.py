@@ -1,22 +1,46 @@
 from typing import Any, Optional
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from user_profile.models import Profile
 
 User = get_user_model()
 
 class Command(BaseCommand):
+    help = 'Create missing user profiles in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='only count users without a profile')
+
     def handle(self, *args: Any, **options: Any) -> str | None:
-        user_without_profile = User.objects.filter(profile__isnull=True)
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        user_without_profile = User.objects.filter(profile__isnull=True).order_by('pk')
+        if options['dry_run']:
+            self.stdout.write('%d user profiles would be created' % user_without_profile.count())
+            return
         created_profile_count = 0
+        last_pk = 0
         try:
-            for user in user_without_profile:
-                profile = Profile(user=user)
-                profile.save()
-                created_profile_count += 1
+            # keyset batches instead of one open cursor: SQLite gives no isolation
+            # between a running SELECT and the inserts into the joined profile table
+            while True:
+                user_ids = list(
+                    user_without_profile.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size]
+                )
+                if not user_ids:
+                    break
+                with transaction.atomic():
+                    Profile.objects.bulk_create([Profile(user_id=user_id) for user_id in user_ids])
+                created_profile_count += len(user_ids)
+                last_pk = user_ids[-1]
+                if options['verbosity'] > 0:
+                    self.stdout.write('%d user profiles created so far' % created_profile_count)
         except Exception as e:
             raise CommandError(e)
         else:
             self.stdout.write(
                 self.style.SUCCESS('%d user profiles created' % created_profile_count)
-            )
\ No newline at end of file
+            )
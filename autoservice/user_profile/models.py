@@ -1,9 +1,10 @@
-from typing import Iterable, Optional
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models.fields.files import FieldFile
 from django.urls import reverse
+from django.core.files.storage import default_storage
 from django.utils.translation import gettext_lazy as _
-from PIL import Image
+from . renditions import schedule_renditions
 
 class Profile(models.Model):
     user = models.OneToOneField(
@@ -14,6 +15,7 @@ class Profile(models.Model):
         null=True, blank=True,
         )
     picture = models.ImageField(_("picture"), upload_to='user_profile/pictures')
+    renditions = models.JSONField(_("renditions"), default=dict, blank=True, editable=False)
     
     class Meta:
         verbose_name = _("profile")
@@ -25,13 +27,69 @@ class Profile(models.Model):
     def get_absolute_url(self):
         return reverse("profile_detail", kwargs={"pk": self.pk})
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def _field_value(self, field):
+        value = getattr(self, field.attname)
+        if isinstance(value, FieldFile):
+            return value.name or ''
+        return value
+
+    def _remember_loaded_values(self):
+        self._loaded_values = {
+            field.attname: self._field_value(field)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None or getattr(self, '_loaded_values', None) is None:
+            self._remember_loaded_values()
+            return
+        # a partial refresh (e.g. of a deferred field) leaves the other changes dirty
+        for field in self._meta.concrete_fields:
+            if field.name in fields or field.attname in fields:
+                self._loaded_values[field.attname] = self._field_value(field)
+
+    def get_dirty_fields(self):
+        # None for instances that were not loaded from the database
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in loaded and loaded[field.attname] != self._field_value(field)
+        ]
+
     def save(self, *args, **kwargs) -> None:
+        dirty_fields = self.get_dirty_fields()
+        if dirty_fields is not None and not kwargs.get('update_fields') and not kwargs.get('force_insert'):
+            if not dirty_fields:
+                return
+            # only write what changed, renditions are updated by the worker meanwhile
+            kwargs['update_fields'] = dirty_fields
+        picture_changed = dirty_fields is None or 'picture' in dirty_fields
         super().save(*args, **kwargs)
-        if self.picture:
-            pic = Image.open(self.picture.path)
-            if pic.width > 300 or pic.height > 300:
-                new_size = (300, 300)
-                pic.thumbnail(new_size)
-                pic.save(self.picture.path)
+        self._remember_loaded_values()
+        if picture_changed and self.picture and self.renditions.get('source') != self.picture.name:
+            schedule_renditions(self.pk)
+
+    def picture_rendition(self, size):
+        # smallest rendition covering the size, None until the worker has built them
+        if not self.picture or self.renditions.get('source') != self.picture.name:
+            return None
+        available = sorted(int(key) for key in self.renditions if key.isdigit())
+        if not available:
+            return None
+        best = next((key for key in available if key >= size), available[-1])
+        return {
+            format: default_storage.url(name)
+            for format, name in self.renditions[str(best)].items()
+        }
 
                 
\ No newline at end of file
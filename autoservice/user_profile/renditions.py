@@ -0,0 +1,97 @@
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+# Profile pictures are resized off the request thread. Every size gets a WebP
+# file and a JPEG (PNG for transparent pictures) fallback, named by the hash of
+# the uploaded file so they can be cached forever.
+
+SIZES = (48, 96, 300)
+UPLOAD_TO = 'user_profile/renditions'
+
+logger = logging.getLogger(__name__)
+_executor = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def schedule_renditions(profile_id):
+    if not getattr(settings, 'PROFILE_RENDITION_WORKERS', 2):
+        transaction.on_commit(lambda: build_renditions(profile_id))
+        return
+    # nothing is marked pending before the commit, a rolled back upload leaves no trace
+    transaction.on_commit(lambda: _submit(profile_id))
+
+
+def _submit(profile_id):
+    global _executor
+    with _pending_lock:
+        if profile_id in _pending:
+            return
+        _pending.add(profile_id)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PROFILE_RENDITION_WORKERS, thread_name_prefix='profile-renditions')
+    _executor.submit(_run_in_worker, profile_id)
+
+
+def _run_in_worker(profile_id):
+    with _pending_lock:
+        _pending.discard(profile_id)
+    close_old_connections()
+    try:
+        build_renditions(profile_id)
+    except Exception:
+        logger.exception('Building renditions for profile %s failed', profile_id)
+    finally:
+        close_old_connections()
+
+
+def _save(image, name, format, **params):
+    if not default_storage.exists(name):
+        buffer = io.BytesIO()
+        image.save(buffer, format, **params)
+        saved_name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        if saved_name != name:
+            # another worker wrote the same content meanwhile
+            default_storage.delete(saved_name)
+    return name
+
+
+def build_renditions(profile_id):
+    Profile = apps.get_model('user_profile', 'Profile')
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is None or not profile.picture:
+        return None
+    source = profile.picture.name
+    with profile.picture.open('rb') as picture:
+        data = picture.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    transparent = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+
+    renditions = {'source': source}
+    for size in SIZES:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size))
+        rendition = {}
+        if features.check('webp'):
+            rendition['webp'] = _save(thumbnail, f'{UPLOAD_TO}/{digest}-{size}.webp', 'WEBP', quality=80)
+        if transparent:
+            rendition['fallback'] = _save(
+                thumbnail.convert('RGBA'), f'{UPLOAD_TO}/{digest}-{size}.png', 'PNG', optimize=True)
+        else:
+            rendition['fallback'] = _save(
+                thumbnail.convert('RGB'), f'{UPLOAD_TO}/{digest}-{size}.jpg', 'JPEG', quality=85, optimize=True)
+        renditions[str(size)] = rendition
+    # the picture may have been replaced while we worked, then the newer job wins
+    Profile.objects.filter(pk=profile_id, picture=source).update(renditions=renditions)
+    return renditions
@@ -8,9 +8,13 @@ User = get_user_model()
 
 # Sygnal tikrina ar useris yra kuriamas ar modifikuojamas ir tuo paciu issaugo profile
 @receiver(post_save, sender=User)
-def sync_profile(sender, instance, created, **kwargs):
+def sync_profile(sender, instance, created, update_fields=None, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+    elif update_fields and set(update_fields) <= {'last_login'}:
+        # prisijungimas profilio nekeicia
+        return
     else:
+        # Profile.save() nieko nedaro, jei profilis nepakeistas
         instance.profile.save()
     
@@ -0,0 +1,12 @@
+from django import template
+
+register = template.Library()
+
+
+@register.inclusion_tag('user_profile/includes/picture.html')
+def profile_picture(profile, size, css_class=''):
+    return {
+        'profile': profile,
+        'rendition': profile.picture_rendition(size) if profile else None,
+        'css_class': css_class,
+    }
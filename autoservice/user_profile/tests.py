@@ -1,3 +1,105 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from . import renditions
+from . models import Profile
 
-# Create your tests here.
+User = get_user_model()
+
+
+def picture_upload(name, color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 300), color).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(PROFILE_RENDITION_WORKERS=1)
+class RenditionTests(TransactionTestCase):
+    # the worker threads read the profile through their own connections, so it must be committed
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root))
+        self.profile = User.objects.create_user('driver').profile
+
+    def wait_for_workers(self):
+        if renditions._executor is not None:
+            renditions._executor.shutdown(wait=True)
+            renditions._executor = None
+
+    def test_upload_after_rolled_back_upload(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.profile.picture = picture_upload('first.jpg', 'red')
+            self.profile.save()
+            raise RuntimeError('rolled back')
+        self.assertNotIn(self.profile.pk, renditions._pending)
+
+        self.profile.picture = picture_upload('second.jpg', 'blue')
+        self.profile.save()
+        self.wait_for_workers()
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.renditions['source'], self.profile.picture.name)
+        self.assertEqual(set(self.profile.renditions), {'source', *map(str, renditions.SIZES)})
+        self.assertNotIn(self.profile.pk, renditions._pending)
+
+
+class DirtyFieldTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', password='secret')
+
+    def setUp(self):
+        patcher = mock.patch('user_profile.models.schedule_renditions')
+        self.schedule_renditions = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.profile = Profile.objects.get(user=self.user)
+
+    def profile_updates(self, queries):
+        return [query['sql'] for query in queries if query['sql'].startswith(f'UPDATE "{Profile._meta.db_table}"')]
+
+    def test_login_does_not_write_the_profile(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.client.login(username='driver', password='secret'))
+        self.assertEqual(self.profile_updates(queries), [])
+
+    def test_unchanged_save_runs_no_query(self):
+        with self.assertNumQueries(0):
+            self.profile.save()
+        self.user.first_name = 'Jonas'
+        with CaptureQueriesContext(connection) as queries:
+            self.user.save()
+        self.assertEqual(self.profile_updates(queries), [])
+
+    def test_only_a_picture_change_schedules_renditions(self):
+        self.profile.user = None
+        with CaptureQueriesContext(connection) as queries:
+            self.profile.save()
+        self.assertEqual(len(self.profile_updates(queries)), 1)
+        self.assertNotIn('picture', self.profile_updates(queries)[0])
+        self.schedule_renditions.assert_not_called()
+
+        self.profile.picture = 'user_profile/pictures/new.jpg'
+        self.profile.save()
+        self.schedule_renditions.assert_called_once_with(self.profile.pk)
+
+    def test_refresh_from_db_resets_the_loaded_values(self):
+        # the rendition worker writes behind the loaded instance
+        Profile.objects.filter(pk=self.profile.pk).update(renditions={'source': 'x.jpg'})
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.get_dirty_fields(), [])
+        with self.assertNumQueries(0):
+            self.profile.save()
+
+        self.profile.picture = 'user_profile/pictures/new.jpg'
+        Profile.objects.filter(pk=self.profile.pk).update(renditions={})
+        self.profile.refresh_from_db(fields=['renditions'])
+        self.assertEqual(self.profile.get_dirty_fields(), ['picture'])